@@ -0,0 +1,22 @@
+import redis
+
+import settings
+from lib.database import Database
+
+# Market name the benchmarks connect as
+MARKET = 'benchmark'
+
+
+def connect(db, fake):
+    """Connects Database to a scratch DB on the configured Redis, or an in process fakeredis server."""
+    settings.API_DB_CONFIG[MARKET] = db
+
+    if fake:
+        # Only needed for this, so not a requirement of the bot
+        import fakeredis
+        pool = redis.ConnectionPool(connection_class=fakeredis.FakeConnection,
+                                    server=fakeredis.FakeServer(),
+                                    decode_responses=True)
+        Database().connect_db(MARKET, connection_pool=pool)
+    else:
+        Database().connect_db(MARKET)
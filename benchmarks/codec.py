@@ -0,0 +1,91 @@
+"""
+Compares the JSON codecs lib.codec can use on order manifests, the main cost of the audit scripts.
+
+Builds synthetic manifests shaped like Orders:Manifest hashes, ThingsBoughtFromGwp and ThingsSoldToGwp are JSON
+lists of Things, from the real catalogue in scripts/m2_thing_data_english.json. No Redis is needed.
+
+    python -m benchmarks.codec --manifests 100000
+"""
+import argparse
+import hashlib
+import importlib
+import json
+import random
+from timeit import default_timer as timer
+
+import settings
+from benchmarks.synthetic_market import load_templates
+from lib import codec
+
+
+def generate_manifests(count, seed=42):
+    rng = random.Random(seed)
+    templates = load_templates()
+
+    def things():
+        bought = []
+        for template in rng.sample(templates, rng.choice([0, 1, 2, 5, 10, 30])):
+            bought.append({
+                'Name': template['Name'],
+                'Quality': template['Quality'] or '',
+                'StuffType': template['StuffType'] or '',
+                'Hash': hashlib.sha1(template['Name'].encode('utf-8')).hexdigest(),
+                'Quantity': rng.randint(1, 500),
+                'BaseMarketValue': template['BaseMarketValue'],
+                'CurrentBuyPrice': round(template['BaseMarketValue'] * rng.uniform(1, 3), 2),
+                'CurrentSellPrice': round(template['BaseMarketValue'] * rng.uniform(0.2, 1.5), 2),
+                'MinifiedContainer': template['MinifiedContainer'],
+                'UseServerPrice': True
+            })
+        return bought
+
+    # Stored the way the API writes them, with the standard library
+    return [{'ThingsBoughtFromGwp': json.dumps(things()),
+             'ThingsSoldToGwp': json.dumps(things()),
+             'DateCreated': 1560000000 + index,
+             'Status': 'Done'}
+            for index in range(count)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--manifests', type=int, default=100000)
+    args = parser.parse_args()
+
+    print('Generating {} manifests'.format(args.manifests))
+    manifests = generate_manifests(args.manifests)
+
+    results = {}
+    for choice in ('json', 'orjson', 'msgspec'):
+        settings.JSON_CODEC = choice
+        try:
+            importlib.reload(codec)
+        except ValueError:
+            print('{:<10} not installed'.format(choice))
+            continue
+
+        start = timer()
+        decoded = [(codec.loads(manifest['ThingsBoughtFromGwp']), codec.loads(manifest['ThingsSoldToGwp']))
+                   for manifest in manifests]
+        decode_time = timer() - start
+
+        start = timer()
+        for bought, sold in decoded:
+            codec.dumps(bought)
+            codec.dumps(sold)
+        encode_time = timer() - start
+
+        results[choice] = decoded
+        print('{:<10} {:>8.3f}s decoding {:>8.3f}s encoding'.format(choice, decode_time, encode_time))
+
+    # Every codec has to give the same answer
+    baseline = results.pop('json')
+    for choice, decoded in results.items():
+        print('{:<10} {}'.format(choice, 'same as json' if decoded == baseline else 'DIFFERENT FROM JSON'))
+
+    settings.JSON_CODEC = 'auto'
+    importlib.reload(codec)
+
+
+if __name__ == '__main__':
+    main()
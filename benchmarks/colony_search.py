@@ -0,0 +1,89 @@
+"""
+Compares colony name searches on the per-letter index against the trigram index.
+
+Fills a scratch Redis database with synthetic colonies, builds both indices, then runs queries made from pieces of
+real colony names on each. The letter search is the ZUNIONSTORE get_colony_orders used to do:
+
+    python -m benchmarks.colony_search --db 15 --colonies 200000
+
+The database is flushed before and after the run.
+"""
+import argparse
+import random
+from timeit import default_timer as timer
+
+import settings
+from benchmarks.synthetic_market import generate_colonies
+from core.routines.indices import colony_name_index
+from lib import trigrams
+from lib.database import Database
+from lib.gwpcc.consts import KEY_COLONY_FULL_TEXT_INDEX, KEY_COLONY_INDEX_BY_ID, KEY_COLONY_METADATA
+from lib.keys import KEY_GLITTERBOT_COLONY_TRIGRAM_INDEX
+
+
+def letter_search(query):
+    pipe = Database().pipeline
+    pipe.zunionstore('benchmark:letters', [KEY_COLONY_FULL_TEXT_INDEX.format(c) for c in query if c.isalnum()])
+    pipe.zrevrangebyscore('benchmark:letters', '+inf', 0)
+    pipe.delete('benchmark:letters')
+    return pipe.execute()[1]
+
+
+def matches(candidates, query):
+    pipe = Database().pipeline
+    for colony_hash in candidates:
+        pipe.hmget(KEY_COLONY_METADATA.format(colony_hash), colony_name_index.data_keys)
+
+    return {colony_hash for colony_hash, values in zip(candidates, pipe.execute())
+            if any(query.lower() in str(value).lower() for value in values)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--db', type=int, required=True, help='Scratch Redis DB number, it will be flushed')
+    parser.add_argument('--colonies', type=int, default=200000)
+    parser.add_argument('--queries', type=int, default=50)
+    args = parser.parse_args()
+
+    if args.db in settings.API_DB_CONFIG.values():
+        parser.error('DB {} belongs to a market, pick a spare one'.format(args.db))
+
+    settings.API_DB_CONFIG['benchmark'] = args.db
+    settings.COLONY_LETTER_INDEX = True
+    Database().connect_db('benchmark')
+    Database().connection.flushdb()
+
+    print('Generating {} colonies'.format(args.colonies))
+    generate_colonies(args.colonies)
+    colony_name_index.update(True)
+
+    # Three to eight letters from the middle of a real name, shorter queries only match the start of words
+    rng = random.Random(42)
+    queries = []
+    for colony_hash in rng.sample(Database().connection.lrange(KEY_COLONY_INDEX_BY_ID, 0, -1), args.queries):
+        name = Database().connection.hget(KEY_COLONY_METADATA.format(colony_hash), 'BaseName')
+        length = rng.randint(3, min(8, len(name)))
+        offset = rng.randint(0, len(name) - length)
+        queries.append(name[offset:offset + length])
+
+    def trigram_search(query):
+        return [colony_hash for colony_hash, _ in trigrams.search(KEY_GLITTERBOT_COLONY_TRIGRAM_INDEX, query, None)]
+
+    for label, search in (('Letters', letter_search), ('Trigrams', trigram_search)):
+        candidates = 0
+        found = 0
+        start = timer()
+        for query in queries:
+            results = search(query)
+            candidates += len(results)
+            found += len(matches(results, query))
+        elapsed = timer() - start
+
+        print('{:<10} {:>8.3f}s {:>10.0f} candidates per query {:>8.0f} matches per query'.format(
+            label, elapsed, candidates / len(queries), found / len(queries)))
+
+    Database().connection.flushdb()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+"""
+Measures decoding HGETALL replies of Thing metadata, before and after the typed decoding layer.
+
+Loads synthetic Thing metadata hashes into a scratch Redis DB, or an in process fakeredis server, then times
+parsing the same replies with the old try-JSON-on-everything parser, the auto parser with its first character
+check, and the Thing metadata schema. Finally it times the full pipelined load with and without decoding.
+
+    python -m benchmarks.decoding --db 15 --hashes 100000
+"""
+import argparse
+import random
+from json import JSONDecoder
+from timeit import default_timer as timer
+
+import settings
+from benchmarks.backend import connect
+from lib.bounded_pipeline import BoundedPipeline
+from lib.database import Database
+from lib.gwpcc import consts
+
+WINDOW = 1000
+
+decoder = JSONDecoder()
+
+
+def legacy_parse(response):
+    """The HGETALL callback as it was, every value goes through JSONDecoder unless it's a True/False/None string."""
+
+    def try_auto_parse(val):
+        try:
+            if val == "False":
+                return False
+            elif val == "True":
+                return True
+            elif val == "None":
+                return None
+            else:
+                val = decoder.decode(val)
+        except Exception:
+            pass
+        return val
+
+    for index in range(1, len(response), 2):
+        response[index] = try_auto_parse(response[index])
+
+    it = iter(response)
+    return dict(zip(it, it))
+
+
+def generate(count, seed=42):
+    rng = random.Random(seed)
+
+    pipe = BoundedPipeline('Thing metadata', connection=Database().raw_connection)
+    keys = []
+    for index in range(count):
+        key = consts.KEY_THING_META.format('{:040x}'.format(rng.getrandbits(160)))
+        base_market_value = round(rng.uniform(0, 2000), 2)
+        pipe.hset(key, mapping={
+            'Name': 'Thing{}'.format(index),
+            'Quality': rng.choice(['', 'Normal', 'Good', 'Excellent']),
+            'StuffType': rng.choice(['', 'Steel', 'WoodLog', 'Plasteel']),
+            'BaseMarketValue': base_market_value,
+            'CurrentBuyPrice': round(base_market_value * 1.5, 2),
+            'CurrentSellPrice': base_market_value,
+            'Quantity': rng.randint(0, 5000),
+            'MinifiedContainer': rng.choice(['True', 'False']),
+            'UseServerPrice': rng.choice(['True', 'False'])
+        })
+        keys.append(key)
+    pipe.execute()
+
+    return keys
+
+
+def load(pipeline_factory, keys):
+    start = timer()
+    for offset in range(0, len(keys), WINDOW):
+        pipe = pipeline_factory()
+        for key in keys[offset:offset + WINDOW]:
+            pipe.hgetall(key)
+        pipe.execute()
+    return timer() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    backend = parser.add_mutually_exclusive_group(required=True)
+    backend.add_argument('--db', type=int, help='Scratch Redis DB number, it will be flushed')
+    backend.add_argument('--fake', action='store_true', help='Use an in process fakeredis server')
+    parser.add_argument('--hashes', type=int, default=100000)
+    args = parser.parse_args()
+
+    if args.db is not None and args.db in settings.API_DB_CONFIG.values():
+        parser.error('DB {} belongs to a market, pick a spare one'.format(args.db))
+
+    connect(args.db or 0, args.fake)
+    Database().connection.flushdb()
+
+    print('Generating {} Thing metadata hashes'.format(args.hashes))
+    keys = generate(args.hashes)
+
+    # The raw replies as Redis sends them, a flat field, value list per hash
+    replies = []
+    for offset in range(0, len(keys), WINDOW):
+        pipe = Database().raw_pipeline
+        for key in keys[offset:offset + WINDOW]:
+            pipe.execute_command('HGETALL', key)
+        replies.extend(pipe.execute())
+    replies = [[item for pair in reply.items() for item in pair] for reply in replies]
+
+    hgetall = Database().connection.response_callbacks['HGETALL']
+    untyped_key = 'Benchmark:NoSchema'
+
+    parsers = [('Before, JSON attempt on every value', lambda reply, key: legacy_parse(reply)),
+               ('Auto parse with first character check', lambda reply, key: hgetall(reply, key=untyped_key)),
+               ('Thing metadata schema', lambda reply, key: hgetall(reply, key=key))]
+
+    for label, parse in parsers:
+        start = timer()
+        for reply, key in zip(replies, keys):
+            parse(list(reply), key)
+        print('{:<40} {:>8.3f}s parsing'.format(label, timer() - start))
+
+    print('{:<40} {:>8.3f}s load'.format('Load, not decoded', load(lambda: Database().raw_pipeline, keys)))
+    print('{:<40} {:>8.3f}s load'.format('Load, decoded', load(lambda: Database().pipeline, keys)))
+
+    Database().connection.flushdb()
+
+
+if __name__ == '__main__':
+    main()
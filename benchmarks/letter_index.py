@@ -0,0 +1,64 @@
+"""
+Compares building the colony letter index client side against the server side Lua script.
+
+Fills a scratch Redis database with synthetic colonies, so point it at a local Redis and a spare DB number:
+
+    python -m benchmarks.letter_index --db 15 --colonies 500000
+
+The database is flushed before and after the run.
+"""
+import argparse
+from timeit import default_timer as timer
+
+import settings
+from benchmarks.synthetic_market import generate_colonies
+from core.routines.indices import colony_name_index
+from lib.database import Database
+
+
+def measure(label, server_side, full_rebuild):
+    db = Database().connection
+
+    colony_name_index.colony_index.server_side = server_side
+
+    before = db.info('stats')
+    start = timer()
+
+    colony_name_index.update(full_rebuild)
+
+    elapsed = timer() - start
+    after = db.info('stats')
+
+    print('{:<32} {:>8.2f}s {:>12} commands run by Redis {:>14} bytes sent'.format(
+        label,
+        elapsed,
+        after['total_commands_processed'] - before['total_commands_processed'],
+        after['total_net_input_bytes'] - before['total_net_input_bytes']))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--db', type=int, required=True, help='Scratch Redis DB number, it will be flushed')
+    parser.add_argument('--colonies', type=int, default=500000)
+    args = parser.parse_args()
+
+    if args.db in settings.API_DB_CONFIG.values():
+        parser.error('DB {} belongs to a market, pick a spare one'.format(args.db))
+
+    settings.API_DB_CONFIG['benchmark'] = args.db
+    Database().connect_db('benchmark')
+    Database().connection.flushdb()
+
+    print('Generating {} colonies'.format(args.colonies))
+    generate_colonies(args.colonies)
+
+    for server_side in (False, True):
+        label = 'Lua script' if server_side else 'Client side'
+        measure('{}, full rebuild'.format(label), server_side, True)
+        measure('{}, nothing changed'.format(label), server_side, False)
+
+    Database().connection.flushdb()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,157 @@
+"""
+Times the full maintenance sequence on synthetic markets of increasing size.
+
+Each scale is generated into an empty database and runs in a fresh process, so peak memory isn't carried over
+from the scale before. Use a spare DB number on a local Redis, or an in process fakeredis server:
+
+    python -m benchmarks.maintenance --db 15 --scales 10000 100000 1000000
+    python -m benchmarks.maintenance --fake --scales 10000 --compare benchmarks/results/last.json
+
+Per phase wall time, CPU time, growth of the peak RSS and Redis command counts come from lib.metrics and are
+written to a JSON results file, --compare prints how each phase moved against an earlier results file.
+
+Logging still goes through lib.log, so /var/log/glitterbot must be writable.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import subprocess
+import time
+from timeit import default_timer as timer
+
+import glitterbot
+import settings
+from benchmarks.backend import connect, MARKET
+from benchmarks.synthetic_market import generate_things, generate_colonies
+from lib.database import Database
+from lib.log import Logger
+from lib.metrics import Metrics
+from lib.runtime_config import RuntimeConfig
+
+
+def run_scale(things, colonies, passes, db, fake, log_level):
+    Logger().log.setLevel(log_level)
+
+    connect(db, fake)
+    Database().connection.flushdb()
+
+    runtime_config = RuntimeConfig()
+    runtime_config.switch_context(MARKET)
+    runtime_config.verify_schema()
+
+    start = timer()
+    generate_things(things)
+    generate_colonies(colonies)
+    generate_time = round(timer() - start, 3)
+
+    print('Generated {} Things and {} colonies in {}s'.format(things, colonies, generate_time))
+
+    # The first pass builds the indices from nothing, later ones only apply what changed.
+    runs = []
+    for _ in range(passes):
+        glitterbot.run_maintenance(MARKET)
+        runs.append(Metrics().summary())
+
+    Database().connection.flushdb()
+
+    return {'Things': things,
+            'Colonies': colonies,
+            'GenerateTime': generate_time,
+            'Runs': runs}
+
+
+def compare(results, previous):
+    """Prints each phase's wall time and peak RSS against the same scale and pass in an earlier results file."""
+    earlier = {(scale['Things'], index): run
+               for scale in previous['Scales'] for index, run in enumerate(scale['Runs'])}
+
+    for scale in results['Scales']:
+        for index, run in enumerate(scale['Runs']):
+            before = earlier.get((scale['Things'], index))
+            if before is None:
+                continue
+
+            print('{} Things, pass {}'.format(scale['Things'], index + 1))
+
+            phases_before = {phase['Name']: phase for phase in before['Phases']}
+            for phase in run['Phases'] + [dict(run, Name='total')]:
+                phase_before = phases_before.get(phase['Name'], before if phase['Name'] == 'total' else None)
+                if phase_before is None:
+                    continue
+
+                change = (phase['WallTime'] - phase_before['WallTime']) / phase_before['WallTime'] * 100 \
+                    if phase_before['WallTime'] else 0
+
+                # Phases show how much they raised the peak RSS, the total the peak itself
+                rss_field = 'PeakRss' if phase['Name'] == 'total' else 'PeakRssGrowth'
+
+                print('  {:<24} {:>9.3f}s -> {:>9.3f}s {:>+7.1f}%   {:>8} MB -> {:>8} MB'.format(
+                    phase['Name'],
+                    phase_before['WallTime'],
+                    phase['WallTime'],
+                    change,
+                    phase_before.get(rss_field),
+                    phase.get(rss_field)))
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], universal_newlines=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    backend = parser.add_mutually_exclusive_group(required=True)
+    backend.add_argument('--db', type=int, help='Scratch Redis DB number, it will be flushed')
+    backend.add_argument('--fake', action='store_true', help='Use an in process fakeredis server')
+    parser.add_argument('--scales', type=int, nargs='+', default=[10000, 100000, 1000000],
+                        help='Numbers of Things to benchmark')
+    parser.add_argument('--colony-ratio', type=float, default=0.5, help='Colonies generated per Thing')
+    parser.add_argument('--passes', type=int, default=2, help='Maintenance runs per scale')
+    parser.add_argument('--log-level', default='WARNING')
+    parser.add_argument('--output', default=os.path.join('benchmarks', 'results',
+                                                         'maintenance-{}.json'.format(int(time.time()))))
+    parser.add_argument('--compare', help='Earlier results file to compare against')
+    args = parser.parse_args()
+
+    if args.db is not None and args.db in settings.API_DB_CONFIG.values():
+        parser.error('DB {} belongs to a market, pick a spare one'.format(args.db))
+
+    results = {'Started': int(time.time()),
+               'Revision': git_revision(),
+               'Python': platform.python_version(),
+               'Backend': 'fakeredis' if args.fake else 'redis',
+               'Scales': []}
+
+    for things in args.scales:
+        # A new process for every scale, the child exits once it's done.
+        with multiprocessing.Pool(1, maxtasksperchild=1) as pool:
+            scale = pool.apply(run_scale, (things,
+                                           int(things * args.colony_ratio),
+                                           args.passes,
+                                           args.db or 0,
+                                           args.fake,
+                                           args.log_level))
+        results['Scales'].append(scale)
+
+        for index, run in enumerate(scale['Runs']):
+            print('{} Things, pass {}: {}s, {}s CPU, {} MB peak, {} commands'.format(
+                things, index + 1, run['WallTime'], run['CpuTime'], run['PeakRss'], run['Commands']))
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, 'w') as results_file:
+        json.dump(results, results_file, indent=2)
+
+    print('Results written to {}'.format(args.output))
+
+    if args.compare:
+        with open(args.compare, 'r') as previous_file:
+            compare(results, json.load(previous_file))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""
+Synthetic market data for the benchmarks.
+
+Things are variations of the real catalogue in scripts/m2_thing_data_english.json, with random stock, trade
+history and base market value votes. Colonies get made up names. Everything is seeded, so the same arguments
+always generate the same market.
+"""
+import os
+import random
+
+from lib import codec
+from lib.bounded_pipeline import BoundedPipeline
+from lib.gwpcc import consts
+from lib.gwpcc.enums import TradeDirection
+from lib.gwpcc.things.thing import Thing
+
+THING_DATA = os.path.join(os.path.dirname(__file__), '..', 'scripts', 'm2_thing_data_english.json')
+
+SYLLABLES = ['ka', 'lo', 'mi', 'ra', 'th', 'en', 'do', 'vu', 'shi', 'or', 'ex', 'qua', 'zy', 'nel', 'pa', 'gar']
+
+
+def load_templates():
+    with open(THING_DATA, 'r', encoding='utf-8') as json_file:
+        # Same rule as import_game_data, poor quality stuff is never in the DB
+        return [thing_data for thing_data in codec.load(json_file) if thing_data['Quality'] != 'Poor']
+
+
+def generate_things(count, seed=42):
+    """Writes count Things with their English names, trade history and BMV votes, returns their hashes."""
+    rng = random.Random(seed)
+    templates = load_templates()
+
+    pipe = BoundedPipeline('Synthetic Things')
+    pipe.sadd(consts.KEY_THING_LOCALE_KNOWN_LANGUAGES, 'english')
+
+    thing_hashes = []
+    for index in range(count):
+        template = templates[index % len(templates)]
+
+        # Past the end of the catalogue, make up new Things based on the real ones
+        variant = index // len(templates)
+        name = template['Name'] if not variant else '{}{}'.format(template['Name'], variant)
+        localized_name = template['LocalizedName'] if not variant else '{} {}'.format(template['LocalizedName'],
+                                                                                       variant)
+
+        base_market_value = round(template['BaseMarketValue'] * rng.uniform(0.5, 2), 2)
+
+        thing = Thing.from_dict({
+            'Name': name,
+            'Quality': template['Quality'] or '',
+            'StuffType': template['StuffType'] or '',
+            'BaseMarketValue': base_market_value,
+            'MinifiedContainer': template['MinifiedContainer'],
+            'UseServerPrice': rng.random() > 0.1,
+            'CurrentBuyPrice': round(base_market_value * rng.uniform(1, 3), 2),
+            'CurrentSellPrice': round(base_market_value * rng.uniform(0.2, 1.5), 2)
+        })
+        thing.Quantity = rng.choice([0, rng.randint(0, 300), rng.randint(0, 20000)])
+        thing.TradeHistory[TradeDirection.ToPlayer] = rng.choice([0, rng.randint(0, 500)])
+        thing.TradeHistory[TradeDirection.ToGWP] = rng.choice([0, rng.randint(0, 500)])
+        thing.save_to_database(pipe)
+
+        # Votes for what players think it's worth, price -> votes
+        votes = {round(base_market_value * rng.uniform(0.8, 1.2), 2): rng.randint(1, 20)
+                 for _ in range(rng.choice([0, 1, 3, 6]))}
+        if votes:
+            pipe.zadd(consts.KEY_THING_BASE_MARKET_VALUE_DATA.format(thing.Hash), votes)
+
+        pipe.zadd(consts.KEY_THING_LOCALE_THING_NAMES.format('english', thing.Hash), {localized_name: 1000})
+
+        thing_hashes.append(thing.Hash)
+
+    pipe.execute()
+
+    return thing_hashes
+
+
+def generate_colonies(count, seed=42):
+    rng = random.Random(seed)
+
+    def name():
+        return ''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 5))).capitalize()
+
+    pipe = BoundedPipeline('Synthetic colonies')
+    for index in range(count):
+        colony_hash = '{:040x}'.format(rng.getrandbits(160))
+        pipe.rpush(consts.KEY_COLONY_INDEX_BY_ID, colony_hash)
+        pipe.hmset(consts.KEY_COLONY_METADATA.format(colony_hash), {'BaseName': '{} {}'.format(name(), name()),
+                                                                     'Planet': name(),
+                                                                     'FactionName': 'The {} {}'.format(name(),
+                                                                                                       name())})
+    pipe.execute()
@@ -0,0 +1,75 @@
+"""
+Compares peak memory of loading the whole catalogue as Things and as ThingRecords, see settings.USE_COMPACT_THINGS.
+
+Generates a synthetic market into a scratch DB, then loads it both ways with tracemalloc running:
+
+    python -m benchmarks.thing_snapshot --db 15 --things 100000
+    python -m benchmarks.thing_snapshot --fake --things 20000
+"""
+import argparse
+import gc
+import tracemalloc
+from timeit import default_timer as timer
+
+import settings
+from benchmarks.backend import connect, MARKET
+from benchmarks.synthetic_market import generate_things
+from core.maintenance_run import MaintenanceRun
+from core.thing_record import ThingRecord
+from lib.database import Database
+from lib.runtime_config import RuntimeConfig
+
+
+def measure(compact):
+    settings.USE_COMPACT_THINGS = compact
+    gc.collect()
+
+    tracemalloc.start()
+    start = timer()
+    maintenance_run = MaintenanceRun()
+    load_time = timer() - start
+    held, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return maintenance_run, load_time, held, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    backend = parser.add_mutually_exclusive_group(required=True)
+    backend.add_argument('--db', type=int, help='Scratch Redis DB number, it will be flushed')
+    backend.add_argument('--fake', action='store_true', help='Use an in process fakeredis server')
+    parser.add_argument('--things', type=int, default=100000)
+    args = parser.parse_args()
+
+    if args.db is not None and args.db in settings.API_DB_CONFIG.values():
+        parser.error('DB {} belongs to a market, pick a spare one'.format(args.db))
+
+    connect(args.db or 0, args.fake)
+    Database().connection.flushdb()
+
+    RuntimeConfig().switch_context(MARKET)
+    RuntimeConfig().verify_schema()
+
+    generate_things(args.things)
+
+    results = {}
+    for compact in (False, True):
+        maintenance_run, load_time, held, peak = measure(compact)
+        results[compact] = maintenance_run.managed_things
+        print('{:<12} {:>8.3f}s {:>10.1f} MB held {:>10.1f} MB peak'.format(
+            'ThingRecord' if compact else 'Thing', load_time, held / 1024 / 1024, peak / 1024 / 1024))
+
+    # Both have to hold the same values
+    fields = ('Name', 'Quality', 'StuffType', 'FullName', 'MinifiedContainer') + ThingRecord.TRACKED
+    different = [thing_hash for thing_hash, thing in results[False].items()
+                 if any(getattr(thing, field) != getattr(results[True][thing_hash], field) for field in fields)
+                 or thing.TradeHistory != results[True][thing_hash].TradeHistory
+                 or thing.BMVVotes != results[True][thing_hash].BMVVotes]
+    print('{} Things differ'.format(len(different)))
+
+    Database().connection.flushdb()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+import settings
+from core.thing_record import ThingRecord, changed_fields, save_changes
+from lib.bounded_pipeline import BoundedPipeline
+from lib.database import Database
+from lib.gwpcc import consts
+from lib.gwpcc.date_utils import get_today_date_string
+from lib.gwpcc.things.thing import Thing
+from lib.log import Logger
+from lib.runtime_config import RuntimeConfig
+
+
+class MaintenanceRun(object):
+    """
+    Thing snapshot shared by every routine of one market's maintenance pass.
+
+    The catalogue is loaded once, routines edit the same Thing objects, and commit() writes what they changed back
+    at the end of the pass. With settings.USE_COMPACT_THINGS the objects are ThingRecords.
+    """
+
+    def __init__(self):
+        connection = Database().connection
+
+        self.thing_hashes = connection.smembers(consts.KEY_THING_INDEX)
+
+        Logger().log.debug('Loading {} Things for maintenance'.format(len(self.thing_hashes)))
+
+        if settings.USE_COMPACT_THINGS:
+            self.all_things = self.__load_records(connection)
+        else:
+            self.all_things = Thing.get_many_from_database_by_hash(self.thing_hashes,
+                                                                   connection,
+                                                                   get_today_date_string())
+
+        # Things GlitterBot manages, excluded items are left alone.
+        ignored = set(RuntimeConfig().ignored_thing_id_list)
+        self.managed_things = {thing_hash: thing for thing_hash, thing in self.all_things.items()
+                               if thing is not None and thing_hash not in ignored}
+
+        # Set by the market analysis, written in the background until finish()
+        self.price_report = None
+
+    def __load_records(self, connection) -> dict:
+        # Only one chunk of full Things is alive at a time, each is turned into a ThingRecord and dropped.
+        thing_hashes = list(self.thing_hashes)
+        date = get_today_date_string()
+
+        records = {}
+        for start in range(0, len(thing_hashes), settings.COMPACT_THINGS_CHUNK_SIZE):
+            things = Thing.get_many_from_database_by_hash(
+                thing_hashes[start:start + settings.COMPACT_THINGS_CHUNK_SIZE], connection, date)
+
+            records.update({thing_hash: None if thing is None else ThingRecord.from_thing(thing)
+                            for thing_hash, thing in things.items()})
+
+        return records
+
+    def commit(self) -> dict:
+        """
+        Writes back only the fields that changed on the Things that changed.
+
+        Returns how many Things and fields were written, or would have been on a dry run.
+        """
+        changed = []
+        for thing in self.managed_things.values():
+            changes = changed_fields(thing)
+            if changes:
+                changed.append((thing, changes))
+
+        written = {'ThingsWritten': len(changed),
+                   'FieldsWritten': sum(len(changes) for _, changes in changed)}
+
+        Logger().log.info('{} of {} Things changed, {} fields to write{}'.format(
+            written['ThingsWritten'],
+            len(self.managed_things),
+            written['FieldsWritten'],
+            ' (dry run, not written)' if RuntimeConfig().dry_run else ''))
+
+        # The pipeline sends as it fills up, so nothing can be queued on a dry run.
+        if RuntimeConfig().dry_run:
+            return written
+
+        pipe = BoundedPipeline('Thing commit', transaction=True)
+
+        for thing, changes in changed:
+            save_changes(thing, pipe, changes)
+
+        pipe.execute()
+
+        return written
+
+    def finish(self):
+        """Waits for anything still being written in the background."""
+        if self.price_report is not None:
+            self.price_report.close()
+            self.price_report = None
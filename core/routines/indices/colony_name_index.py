@@ -1,53 +1,82 @@
-from collections import Counter
-
+import settings
+from core.routines.indices.letter_index import LetterIndex
+from lib import trigrams
 from lib.database import Database
 from lib.gwpcc.consts import KEY_COLONY_FULL_TEXT_INDEX, KEY_COLONY_METADATA, \
     KEY_COLONY_INDEX_BY_ID
+from lib.keys import KEY_GLITTERBOT_COLONY_TRIGRAM_INDEX
 from lib.log import Logger
 
+colony_index = LetterIndex('Colony', KEY_COLONY_FULL_TEXT_INDEX)
 
-def update():
-    db = Database().connection
+colony_trigram_index = LetterIndex('ColonyTrigrams', KEY_GLITTERBOT_COLONY_TRIGRAM_INDEX, terms=trigrams.trigrams)
+
+data_keys = ['BaseName', 'Planet', 'FactionName']
+
+
+def update(full_rebuild=False):
+    Logger().log.debug('Building colony indices')
 
-    Logger().log.debug('Clearing existing colony name indices')
+    if settings.COLONY_LETTER_INDEX:
+        colony_index.update(_colony_letters(), full_rebuild, _listed_colonies)
 
-    pipe = db.pipeline()
-    for key_to_delete in db.scan_iter(KEY_COLONY_FULL_TEXT_INDEX.format('*'), 10000):
-        pipe.delete(key_to_delete)
-    pipe.execute()
+    # Fields are kept apart so no trigram spans two of them
+    colony_trigram_index.update(_colony_letters(' '), full_rebuild, _listed_colonies)
 
-    Logger().log.debug('Fetching master Colony ID index')
+    Logger().log.debug('Finished colony indices')
 
-    # Load the colony index
-    colony_index = db.lrange(KEY_COLONY_INDEX_BY_ID, 0, -1)
 
+def _colony_letters(separator=''):
     # For each colony
-    pipe = db.pipeline()
-    for colony_hash in colony_index:
-        pipe.hgetall(KEY_COLONY_METADATA.format(colony_hash))
+    for colony_hash, colony_data in iter_colony_metadata(data_keys):
+        letters = []
+        # Now split the new name and update the indices
+        for data_key, value in zip(data_keys, colony_data):
+            if value is None:
+                Logger().log.error('Error processing Colony: {}, Error was missing {}'.format(colony_hash, data_key))
+                break
 
-    colony_results = dict(zip(colony_index, pipe.execute()))
+            letters.append(str(value).lower())
 
-    pipe = db.pipeline()
+        yield colony_hash, separator.join(letters)
 
-    data_keys = ['BaseName', 'Planet', 'FactionName']
 
-    Logger().log.debug('Building colony indices')
-    # For each thing
-    for colony_hash, colony_data in colony_results.items():
-        # Now split the new name and update the indices
-        for data_key in data_keys:
-            try:
-                # Count how many times a letter occurs in the word
-                scores = Counter(str(colony_data[data_key]).lower())
+def _listed_colonies(colony_hashes, window=1000):
+    # The colony index is paged by position, so a colony can be skipped when it changes under us. One that's still
+    # listed stays in the name indices, and is picked up again next run. Only the colonies asked about are kept in
+    # memory, the list is read window colonies at a time.
+    unlisted = set(colony_hashes)
+    db = Database().connection
 
-                for letter, score in scores.items():
-                    pipe.zincrby(KEY_COLONY_FULL_TEXT_INDEX.format(letter), score, colony_hash)
+    start = 0
+    while unlisted:
+        page = db.lrange(KEY_COLONY_INDEX_BY_ID, start, start + window - 1)
 
-            except KeyError as e:
-                Logger().log.error('Error processing Colony: {}, Error was {}'.format(colony_hash, e))
-                break
-    # Execute
-    Logger().log.debug('Writing out colony indices to database')
-    pipe.execute()
-    Logger().log.debug('Finished colony indices')
+        if not page:
+            break
+
+        unlisted.difference_update(page)
+        start += window
+
+    return [colony_hash for colony_hash in colony_hashes if colony_hash not in unlisted]
+
+
+def iter_colony_metadata(fields, window=1000):
+    """Yields (colony hash, values of fields) for every colony in the master index, window colonies at a time."""
+    db = Database().connection
+
+    start = 0
+    while True:
+        # Load the colony index a page at a time
+        colony_hashes = db.lrange(KEY_COLONY_INDEX_BY_ID, start, start + window - 1)
+
+        if not colony_hashes:
+            return
+
+        pipe = db.pipeline()
+        for colony_hash in colony_hashes:
+            pipe.hmget(KEY_COLONY_METADATA.format(colony_hash), fields)
+
+        yield from zip(colony_hashes, pipe.execute())
+
+        start += window
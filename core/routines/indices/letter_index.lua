@@ -0,0 +1,70 @@
+-- Counts the letters of a batch of items and applies them to a letter index.
+--
+-- KEYS[1]  Fingerprint hash of item -> JSON letter counts
+-- KEYS[2]  Set recording the items seen by an incremental update
+-- ARGV[1]  Letter key prefix, the part of the index key before the letter
+-- ARGV[2]  Letter key suffix, the part of the index key after the letter
+-- ARGV[3]  '1' when writing a fresh rebuild, previous fingerprints are ignored and the seen set is not used
+-- ARGV[4+] item, letters pairs, letters is the already lower cased and filtered text to count
+--
+-- Returns the number of items changed followed by every letter written to.
+
+local fingerprints = KEYS[1]
+local seen = KEYS[2]
+local prefix = ARGV[1]
+local suffix = ARGV[2]
+local rebuild = ARGV[3] == '1'
+
+local changed = 0
+local letters_written = {}
+
+for i = 4, #ARGV, 2 do
+    local item = ARGV[i]
+
+    -- One UTF-8 encoded character at a time.
+    local counts = {}
+    for letter in string.gmatch(ARGV[i + 1], '[%z\1-\127\194-\244][\128-\191]*') do
+        counts[letter] = (counts[letter] or 0) + 1
+    end
+
+    local previous = {}
+    if not rebuild then
+        redis.call('SADD', seen, item)
+
+        local fingerprint = redis.call('HGET', fingerprints, item)
+        if fingerprint then
+            previous = cjson.decode(fingerprint)
+        end
+    end
+
+    local different = false
+
+    for letter, count in pairs(counts) do
+        local delta = count - (previous[letter] or 0)
+        if delta ~= 0 then
+            redis.call('ZINCRBY', prefix .. letter .. suffix, delta, item)
+            letters_written[letter] = true
+            different = true
+        end
+    end
+
+    -- Don't leave zero scores behind, searches match on score >= 0.
+    for letter, _ in pairs(previous) do
+        if counts[letter] == nil then
+            redis.call('ZREM', prefix .. letter .. suffix, item)
+            different = true
+        end
+    end
+
+    if rebuild or different then
+        redis.call('HSET', fingerprints, item, cjson.encode(counts))
+        changed = changed + 1
+    end
+end
+
+local result = { changed }
+for letter, _ in pairs(letters_written) do
+    table.insert(result, letter)
+end
+
+return result
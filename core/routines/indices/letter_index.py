@@ -0,0 +1,304 @@
+import os
+import threading
+from collections import Counter
+from itertools import islice
+from typing import Iterable, Tuple
+
+from redis.exceptions import WatchError
+
+import settings
+from lib import codec
+from lib.bounded_pipeline import BoundedPipeline
+from lib.database import Database
+from lib.keys import KEY_GLITTERBOT_FTI_FINGERPRINTS, KEY_GLITTERBOT_FTI_GENERATION, KEY_GLITTERBOT_FTI_SHADOW, \
+    KEY_GLITTERBOT_FTI_RETIRED, KEY_GLITTERBOT_FTI_RETIRED_KEYS, KEY_GLITTERBOT_FTI_SEEN
+from lib.log import Logger
+
+
+class LetterIndex(object):
+    """
+    Letter frequency full text index maintained incrementally.
+
+    Each item's letter counts are remembered in a fingerprint hash, so an update only sends the ZINCRBY deltas
+    for items whose counts changed, and removes items that are no longer present.
+
+    Full rebuilds are written into shadow keys and renamed over the live keys in one transaction, so searches
+    never see a missing or half built index. The replaced keys are deleted in the background.
+
+    Items are consumed and written out batch_size at a time, so memory use doesn't grow with the number of items.
+
+    Items are given as (item, letters) where letters is the text to count, already lower cased and filtered.
+    With server_side set the counting and index writes are done by a Lua script, one EVALSHA per batch instead
+    of a ZINCRBY per letter per item.
+
+    terms splits the text into something other than letters, trigrams for example, each term gets a key of its
+    own in place of a letter. The Lua script only counts letters, so it isn't used with terms.
+    """
+
+    with open(os.path.join(os.path.dirname(__file__), 'letter_index.lua'), 'r') as script_file:
+        script_source = script_file.read()
+
+    # Times a rebuild tries to swap in before giving up, each try fails only if something else changed the index
+    swap_attempts = 5
+
+    def __init__(self, name: str, index_key: str, batch_size=1000, server_side=None, terms=None):
+        self.name = name
+        self.index_key = index_key
+        self.batch_size = batch_size
+        self.terms = terms
+        self.server_side = settings.FULL_TEXT_INDEX_SERVER_SIDE if server_side is None else server_side
+        self.server_side = self.server_side and terms is None
+        self.fingerprint_key = KEY_GLITTERBOT_FTI_FINGERPRINTS.format(name)
+        self.retired_keys = KEY_GLITTERBOT_FTI_RETIRED_KEYS.format(name)
+        self.seen_key = KEY_GLITTERBOT_FTI_SEEN.format(name)
+
+    def update(self, letters: Iterable[Tuple[str, str]], full_rebuild=False, still_present=None):
+        """
+        Brings the index up to date with letters.
+
+        Items in the index that aren't in letters are removed, unless still_present, given a list of them, returns
+        them. Sources that can skip items while they're read use it to check before anything is removed.
+        """
+        connection = Database().connection
+
+        # Without fingerprints we can't tell what's in the index, so start again.
+        if full_rebuild or not connection.exists(self.fingerprint_key):
+            self.__rebuild(letters)
+        else:
+            self.__update_changed(letters, still_present)
+
+        # Clear out keys replaced by this or any earlier rebuild. The connection is taken now, the caller may have
+        # moved on to another market by the time the thread runs. What's left when the process exits is still in
+        # the retired set, and goes next time.
+        threading.Thread(target=self.__delete_retired_keys,
+                         args=(connection,),
+                         name='{} index cleanup'.format(self.name),
+                         daemon=True).start()
+
+    def __update_changed(self, letters, still_present):
+        connection = Database().connection
+
+        # Remember which items still exist, in Redis rather than here.
+        connection.delete(self.seen_key)
+
+        pipe = BoundedPipeline('{} index update'.format(self.name), transaction=True)
+
+        changed = 0
+        total = 0
+        for batch in self.__batches(letters):
+            if self.server_side:
+                changed += self.__run_script(self.fingerprint_key, self.index_key, batch, False)[0]
+                total += len(batch)
+                continue
+
+            previous_counts = connection.hmget(self.fingerprint_key, list(batch.keys()))
+
+            pipe.sadd(self.seen_key, *batch.keys())
+
+            for (item, item_letters), previous in zip(batch.items(), previous_counts):
+                counts = self.__count(item_letters)
+                previous = previous or {}
+
+                if counts == previous:
+                    continue
+
+                with pipe.group():
+                    self.__apply_delta(pipe, self.index_key, item, previous, counts)
+                    pipe.hset(self.fingerprint_key, item, self.__fingerprint(counts))
+                changed += 1
+
+            # The next batch reads the fingerprints written by this one
+            pipe.flush()
+            total += len(batch)
+
+        pipe.execute()
+
+        removed = self.__remove_unseen(still_present)
+
+        Logger().log.debug('Updated {} index, {} changed and {} removed of {}'.format(
+            self.name, changed, removed, total))
+
+    def __remove_unseen(self, still_present):
+        connection = Database().connection
+
+        # Find the items that no longer exist first, deleting while scanning could skip some.
+        unseen = []
+        page = []
+        for item_fingerprint in connection.hscan_iter(self.fingerprint_key, count=self.batch_size):
+            page.append(item_fingerprint)
+
+            if len(page) >= self.batch_size:
+                unseen.extend(self.__filter_unseen(page))
+                page = []
+
+        if page:
+            unseen.extend(self.__filter_unseen(page))
+
+        if unseen and still_present is not None:
+            present = set(still_present([item for item, _ in unseen]))
+            if present:
+                Logger().log.debug('Keeping {} items in the {} index that were missed but still exist'.format(
+                    len(present), self.name))
+            unseen = [(item, fingerprint) for item, fingerprint in unseen if item not in present]
+
+        pipe = BoundedPipeline('{} index removals'.format(self.name), transaction=True)
+
+        for item, fingerprint in unseen:
+            with pipe.group():
+                self.__apply_delta(pipe, self.index_key, item, codec.loads(fingerprint), {})
+                pipe.hdel(self.fingerprint_key, item)
+
+        pipe.execute()
+
+        connection.delete(self.seen_key)
+
+        return len(unseen)
+
+    def __filter_unseen(self, page):
+        pipe = Database().pipeline
+        for item, _ in page:
+            pipe.sismember(self.seen_key, item)
+
+        return [item_fingerprint for item_fingerprint, seen in zip(page, pipe.execute()) if not seen]
+
+    def __rebuild(self, letters):
+        connection = Database().connection
+
+        generation = connection.incr(KEY_GLITTERBOT_FTI_GENERATION.format(self.name))
+
+        Logger().log.debug('Rebuilding {} index from scratch as generation {}'.format(self.name, generation))
+
+        # Leftovers from a rebuild that never finished.
+        abandoned = list(connection.scan_iter(KEY_GLITTERBOT_FTI_SHADOW.format(self.name, '*', '*'), 10000))
+        if abandoned:
+            connection.sadd(self.retired_keys, *abandoned)
+
+        shadow_index_key = KEY_GLITTERBOT_FTI_SHADOW.format(self.name, generation, '{}')
+        shadow_fingerprint_key = KEY_GLITTERBOT_FTI_SHADOW.format(self.name, generation, self.fingerprint_key)
+
+        pipe = BoundedPipeline('{} index rebuild'.format(self.name), transaction=True)
+
+        letters_written = set()
+        written = False
+        for batch in self.__batches(letters):
+            if self.server_side:
+                letters_written.update(self.__run_script(shadow_fingerprint_key, shadow_index_key, batch, True)[1:])
+                written = True
+                continue
+
+            for item, item_letters in batch.items():
+                counts = self.__count(item_letters)
+                with pipe.group():
+                    self.__apply_delta(pipe, shadow_index_key, item, {}, counts)
+                    pipe.hset(shadow_fingerprint_key, item, self.__fingerprint(counts))
+                letters_written.update(counts)
+
+            written = True
+
+        pipe.execute()
+
+        Logger().log.debug('Swapping {} index to generation {}'.format(self.name, generation))
+
+        for _ in range(self.swap_attempts):
+            if self.__swap(generation, shadow_index_key, shadow_fingerprint_key, letters_written, written):
+                return
+            Logger().log.debug('{} index changed while swapping, trying again'.format(self.name))
+
+        # The live index is left as it was for the next run to bring up to date, and the shadow keys are retired
+        Logger().log.warning('{} index kept changing, gave up swapping to generation {} after {} attempts'.format(
+            self.name, generation, self.swap_attempts))
+
+        shadow_keys = [shadow_index_key.format(letter) for letter in letters_written]
+        if written:
+            shadow_keys.append(shadow_fingerprint_key)
+        if shadow_keys:
+            connection.sadd(self.retired_keys, *shadow_keys)
+
+    def __swap(self, generation, shadow_index_key, shadow_fingerprint_key, letters_written, written):
+        """
+        Moves the current keys aside and the new ones into place in one transaction, False if the index changed.
+
+        A RENAME of a key that's gone fails inside EXEC without stopping the others, so the live keys are WATCHed
+        from before they're listed. Every change to the index goes through the fingerprints, which are WATCHed too.
+        """
+        with Database().connection.pipeline() as pipe:
+            try:
+                pipe.watch(self.fingerprint_key)
+
+                live_keys = list(pipe.scan_iter(self.index_key.format('*'), 10000))
+                if live_keys:
+                    pipe.watch(*live_keys)
+                if pipe.exists(self.fingerprint_key):
+                    live_keys.append(self.fingerprint_key)
+
+                pipe.multi()
+
+                retired = [KEY_GLITTERBOT_FTI_RETIRED.format(self.name, generation, key) for key in live_keys]
+                for key, retired_key in zip(live_keys, retired):
+                    pipe.rename(key, retired_key)
+                if retired:
+                    pipe.sadd(self.retired_keys, *retired)
+
+                for letter in letters_written:
+                    pipe.rename(shadow_index_key.format(letter), self.index_key.format(letter))
+
+                # Nothing is written to the shadow fingerprints if there were no items
+                if written:
+                    pipe.rename(shadow_fingerprint_key, self.fingerprint_key)
+
+                pipe.execute()
+                return True
+            except WatchError:
+                return False
+
+    def __delete_retired_keys(self, connection):
+        while True:
+            # A few at a time so we never block Redis for long.
+            keys = connection.spop(self.retired_keys, 100)
+            if not keys:
+                break
+
+            connection.unlink(*keys)
+
+    def __run_script(self, fingerprint_key, index_key, batch, rebuild):
+        prefix, suffix = index_key.split('{}')
+
+        args = [prefix, suffix, '1' if rebuild else '0']
+        for item, item_letters in batch.items():
+            args.extend((item, item_letters))
+
+        # register_script keeps the SHA and only sends the source if Redis doesn't have it cached.
+        script = Database().connection.register_script(self.script_source)
+
+        return script(keys=[fingerprint_key, self.seen_key], args=args)
+
+    def __batches(self, pairs):
+        pairs = iter(pairs)
+
+        while True:
+            # Later duplicates of an item replace earlier ones within a batch.
+            batch = dict(islice(pairs, self.batch_size))
+            if not batch:
+                return
+            yield batch
+
+    def __count(self, text):
+        return Counter(text if self.terms is None else self.terms(text))
+
+    @staticmethod
+    def __apply_delta(pipe, index_key, item, previous, counts):
+        for letter in set(previous) | set(counts):
+            delta = counts.get(letter, 0) - previous.get(letter, 0)
+
+            if not delta:
+                continue
+
+            # Don't leave zero scores behind, searches match on score >= 0.
+            if letter not in counts:
+                pipe.zrem(index_key.format(letter), item)
+            else:
+                pipe.zincrby(index_key.format(letter), delta, item)
+
+    @staticmethod
+    def __fingerprint(counts):
+        return codec.dumps(counts)
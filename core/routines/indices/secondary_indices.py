@@ -0,0 +1,286 @@
+from collections import defaultdict
+
+from core.maintenance_run import MaintenanceRun
+from lib import codec
+from lib.bounded_pipeline import BoundedPipeline
+from lib.database import Database
+from lib.gwpcc.consts import KEY_COLONY_INDEX_BY_ID, KEY_COLONY_ALL_ORDERS, KEY_ORDER_MANIFEST
+from lib.keys import KEY_GLITTERBOT_THING_ORDERS, KEY_GLITTERBOT_THINGS_MISSING_NAME, KEY_GLITTERBOT_ORPHAN_ORDERS, \
+    KEY_GLITTERBOT_INDEX_BUILDING, KEY_GLITTERBOT_ORDER_INDEX_CURSORS, KEY_GLITTERBOT_ORDER_INDEX_HIGH_WATER
+from lib.log import Logger
+
+# Manifest fields read to index an order
+MANIFEST_FIELDS = ['ThingsBoughtFromGwp', 'ThingsSoldToGwp', 'DateCreated']
+
+# Every order in a list, indexed whatever the high water mark
+ALL_ORDERS = [(0, -1)]
+
+
+def update(maintenance_run: MaintenanceRun, full_rebuild=False):
+    """Updates the indices the ops scripts look things up in, so they don't have to SCAN the whole database."""
+    __index_missing_names(maintenance_run)
+    __index_orders(full_rebuild)
+
+
+def __index_missing_names(maintenance_run: MaintenanceRun):
+    # Things with no metadata at all are in the snapshot as None
+    missing = [thing_hash for thing_hash, thing in maintenance_run.all_things.items()
+               if thing is None or not thing.Name or not thing.FullName]
+
+    Logger().log.debug('{} Things are missing a name'.format(len(missing)))
+
+    __replace_set(KEY_GLITTERBOT_THINGS_MISSING_NAME, missing)
+
+
+def __index_orders(full_rebuild, window=1000):
+    """
+    Indexes each order under the Things in its manifest, only reading the orders added since the last run.
+
+    Every colony's order list has a cursor, its length and the order ids at its head and tail when it was last
+    read, and a high water mark, the newest DateCreated indexed from it. A list that grew by n with the same head
+    had n orders appended, with the same tail n prepended, and only those n are read. A list that was trimmed as
+    well, even by as many orders as were added so its length didn't change, has different ends, and is read in
+    full but only indexes the orders from the high water mark on. A list that shrank is indexed again in full.
+
+    A full rebuild builds the Thing order sets, cursors and high water marks aside and swaps them in at the end,
+    so orders that have since been trimmed or deleted drop out of the index.
+    """
+    connection = Database().connection
+
+    # Without cursors nothing has been indexed yet
+    full_rebuild = full_rebuild or not connection.exists(KEY_GLITTERBOT_ORDER_INDEX_CURSORS)
+
+    if full_rebuild:
+        # Left behind by a full rebuild that didn't finish
+        __delete_keys(KEY_GLITTERBOT_INDEX_BUILDING.format(KEY_GLITTERBOT_THING_ORDERS.format('*')))
+        Database().connection.delete(KEY_GLITTERBOT_INDEX_BUILDING.format(KEY_GLITTERBOT_ORDER_INDEX_CURSORS),
+                                     KEY_GLITTERBOT_INDEX_BUILDING.format(KEY_GLITTERBOT_ORDER_INDEX_HIGH_WATER))
+
+    cursors_key = __target(KEY_GLITTERBOT_ORDER_INDEX_CURSORS, full_rebuild)
+    high_water_key = __target(KEY_GLITTERBOT_ORDER_INDEX_HIGH_WATER, full_rebuild)
+
+    orphans = {}
+    indexed_things = set()
+    high_water_written = False
+    indexed = 0
+    colonies_read = 0
+
+    start = 0
+    while True:
+        colony_hashes = connection.lrange(KEY_COLONY_INDEX_BY_ID, start, start + window - 1)
+
+        if not colony_hashes:
+            break
+
+        pipe = Database().pipeline
+        for colony_hash in colony_hashes:
+            pipe.llen(KEY_COLONY_ALL_ORDERS.format(colony_hash))
+            pipe.lindex(KEY_COLONY_ALL_ORDERS.format(colony_hash), 0)
+            pipe.lindex(KEY_COLONY_ALL_ORDERS.format(colony_hash), -1)
+        pipe.hmget(KEY_GLITTERBOT_ORDER_INDEX_CURSORS, colony_hashes)
+        pipe.hmget(KEY_GLITTERBOT_ORDER_INDEX_HIGH_WATER, colony_hashes)
+        replies = pipe.execute()
+        ends, cursors, high_water = replies[:-2], replies[-2], replies[-1]
+
+        reads = []
+        for index, (colony_hash, cursor, mark) in enumerate(zip(colony_hashes, cursors, high_water)):
+            length, head, tail = ends[index * 3:index * 3 + 3]
+            ranges = __new_orders([length, head, tail], cursor, full_rebuild)
+
+            if ranges:
+                # A list indexed again from scratch ignores its high water mark
+                reads.append((colony_hash, [length, head, tail], None if ranges is ALL_ORDERS else mark, ranges))
+
+        pipe = Database().pipeline
+        for colony_hash, _, _, ranges in reads:
+            for first, last in ranges:
+                pipe.lrange(KEY_COLONY_ALL_ORDERS.format(colony_hash), first, last)
+        replies = iter(pipe.execute())
+
+        colony_orders = []
+        for colony_hash, _, mark, ranges in reads:
+            order_ids = dict.fromkeys(order_id for _ in ranges for order_id in next(replies))
+            colony_orders.extend((colony_hash, order_id, mark) for order_id in order_ids)
+
+        # Left as strings, each manifest is decoded once here
+        pipe = BoundedPipeline('Order manifests', connection=Database().raw_connection, keep_replies=True)
+        for _, order_id, _ in colony_orders:
+            pipe.hmget(KEY_ORDER_MANIFEST.format(order_id), MANIFEST_FIELDS)
+        manifests = pipe.execute()
+
+        thing_orders = defaultdict(dict)
+        new_high_water = {}
+        for (colony_hash, order_id, mark), (bought, sold, date_created) in zip(colony_orders, manifests):
+            if date_created is None:
+                orphans[order_id] = colony_hash
+                continue
+
+            score = __score(date_created)
+            new_high_water[colony_hash] = max(score, new_high_water.get(colony_hash, mark or 0))
+
+            # Orders created in the same second as the newest one indexed are indexed again, ZADD doesn't mind
+            if mark is not None and score < mark:
+                continue
+
+            for thing_hash in __thing_hashes(bought) | __thing_hashes(sold):
+                thing_orders[thing_hash][order_id] = score
+            indexed += 1
+
+        # The cursors go last, if this fails part way the orders are read again next time
+        pipe = BoundedPipeline('Thing orders')
+        for thing_hash, orders in thing_orders.items():
+            pipe.zadd(__target(KEY_GLITTERBOT_THING_ORDERS.format(thing_hash), full_rebuild), orders)
+        if new_high_water:
+            pipe.hset(high_water_key, mapping=new_high_water)
+        if reads:
+            pipe.hset(cursors_key, mapping={colony_hash: codec.dumps(cursor) for colony_hash, cursor, _, _ in reads})
+        pipe.execute()
+
+        indexed_things.update(thing_orders)
+        high_water_written = high_water_written or bool(new_high_water)
+        colonies_read += len(reads)
+        start += window
+
+    Logger().log.debug('Indexed {} orders from {} colonies, {} new orphaned order references{}'.format(
+        indexed, colonies_read, len(orphans), ' (full rebuild)' if full_rebuild else ''))
+
+    if full_rebuild:
+        __replace_thing_orders(indexed_things)
+        __swap(high_water_key, KEY_GLITTERBOT_ORDER_INDEX_HIGH_WATER, high_water_written)
+        __swap(cursors_key, KEY_GLITTERBOT_ORDER_INDEX_CURSORS, bool(colonies_read))
+        __replace_hash(KEY_GLITTERBOT_ORPHAN_ORDERS, orphans)
+    else:
+        __update_orphans(orphans)
+
+
+def __new_orders(cursor, previous, full_rebuild):
+    """LRANGE ranges of a colony's order list to read, ALL_ORDERS to index all of it again, or None."""
+    length, head, tail = cursor
+
+    # Cursors from before the ends were kept are plain lengths
+    if full_rebuild or not isinstance(previous, list) or length < previous[0]:
+        return ALL_ORDERS
+
+    previous_length, previous_head, previous_tail = previous
+    added = length - previous_length
+
+    if cursor == previous:
+        return None
+    if added and head == previous_head and tail != previous_tail:
+        return [(-added, -1)]
+    if added and tail == previous_tail and head != previous_head:
+        return [(0, added - 1)]
+
+    # Trimmed as well as added to, which orders are new isn't known
+    return [(0, -1)]
+
+
+def __replace_thing_orders(thing_hashes):
+    """Renames the rebuilt Thing order sets over the live ones and deletes the live ones that weren't rebuilt."""
+    keys = {KEY_GLITTERBOT_THING_ORDERS.format(thing_hash) for thing_hash in thing_hashes}
+    building_keys = {KEY_GLITTERBOT_INDEX_BUILDING.format(key) for key in keys}
+
+    stale = [key for key in Database().connection.scan_iter(match=KEY_GLITTERBOT_THING_ORDERS.format('*'), count=1000)
+             if key not in keys and key not in building_keys]
+
+    pipe = BoundedPipeline('Thing orders swap')
+    for key in keys:
+        pipe.rename(KEY_GLITTERBOT_INDEX_BUILDING.format(key), key)
+    for offset in range(0, len(stale), 1000):
+        pipe.delete(*stale[offset:offset + 1000])
+    pipe.execute()
+
+    Logger().log.debug('Swapped in {} Thing order sets, {} stale ones deleted'.format(len(keys), len(stale)))
+
+
+def __update_orphans(orphans):
+    """Adds newly found orphaned orders, and indexes the ones whose manifest has turned up since."""
+    known = Database().connection.hkeys(KEY_GLITTERBOT_ORPHAN_ORDERS)
+
+    pipe = BoundedPipeline('Orphan checks', connection=Database().raw_connection, keep_replies=True)
+    for order_id in known:
+        pipe.hmget(KEY_ORDER_MANIFEST.format(order_id), MANIFEST_FIELDS)
+    manifests = pipe.execute()
+
+    found = []
+    pipe = BoundedPipeline('Orphan orders')
+    for order_id, (bought, sold, date_created) in zip(known, manifests):
+        if date_created is None:
+            continue
+
+        found.append(order_id)
+        for thing_hash in __thing_hashes(bought) | __thing_hashes(sold):
+            pipe.zadd(KEY_GLITTERBOT_THING_ORDERS.format(thing_hash), {order_id: __score(date_created)})
+
+    if found:
+        pipe.hdel(KEY_GLITTERBOT_ORPHAN_ORDERS, *found)
+    if orphans:
+        pipe.hset(KEY_GLITTERBOT_ORPHAN_ORDERS, mapping=orphans)
+    pipe.execute()
+
+
+def __score(date_created) -> float:
+    # Orders sort by creation time, one we can't read goes first
+    try:
+        return float(date_created)
+    except ValueError:
+        return 0
+
+
+def __thing_hashes(things_json) -> set:
+    if not things_json:
+        return set()
+
+    try:
+        things = codec.loads(things_json)
+    except ValueError:
+        return set()
+
+    return {thing['Hash'] for thing in things if isinstance(thing, dict) and thing.get('Hash')}
+
+
+def __target(key, full_rebuild) -> str:
+    return KEY_GLITTERBOT_INDEX_BUILDING.format(key) if full_rebuild else key
+
+
+def __delete_keys(pattern):
+    keys = list(Database().connection.scan_iter(match=pattern, count=1000))
+
+    pipe = BoundedPipeline('Delete {}'.format(pattern))
+    for offset in range(0, len(keys), 1000):
+        pipe.delete(*keys[offset:offset + 1000])
+    pipe.execute()
+
+
+def __replace_set(key, members):
+    # Built aside and renamed over the live key, so readers never see it half done
+    building_key = KEY_GLITTERBOT_INDEX_BUILDING.format(key)
+
+    pipe = BoundedPipeline('Index {}'.format(key))
+    pipe.delete(building_key)
+    for offset in range(0, len(members), 1000):
+        pipe.sadd(building_key, *members[offset:offset + 1000])
+    pipe.execute()
+
+    __swap(building_key, key, bool(members))
+
+
+def __replace_hash(key, mapping):
+    building_key = KEY_GLITTERBOT_INDEX_BUILDING.format(key)
+    items = list(mapping.items())
+
+    pipe = BoundedPipeline('Index {}'.format(key))
+    pipe.delete(building_key)
+    for offset in range(0, len(items), 1000):
+        pipe.hset(building_key, mapping=dict(items[offset:offset + 1000]))
+    pipe.execute()
+
+    __swap(building_key, key, bool(items))
+
+
+def __swap(building_key, key, written):
+    # An empty index has nothing to rename, it's just deleted
+    if written:
+        Database().connection.rename(building_key, key)
+    else:
+        Database().connection.delete(key)
@@ -1,49 +1,96 @@
-from collections import Counter
+import asyncio
 
+from core.maintenance_run import MaintenanceRun
+from core.routines.indices.letter_index import LetterIndex
+from lib import trigrams
+from lib.async_database import AsyncDatabase
+from lib.bounded_pipeline import BoundedPipeline
 from lib.database import Database
-from lib.gwpcc.consts import KEY_THING_INDEX, KEY_THING_LOCALE_KNOWN_LANGUAGES, KEY_THING_LOCALE_THING_NAMES, \
+from lib.gwpcc.consts import KEY_THING_LOCALE_KNOWN_LANGUAGES, KEY_THING_LOCALE_THING_NAMES, \
     KEY_THING_LOCALE_THING_NAME, KEY_THING_LOCALE_FULL_TEXT_INDEX
-# The index only updates english names
-from lib.gwpcc.things.thing import Thing
+from lib.keys import KEY_GLITTERBOT_THING_TRIGRAM_INDEX
 from lib.log import Logger
 
+thing_index_letters = LetterIndex('Thing', KEY_THING_LOCALE_FULL_TEXT_INDEX)
 
-def update():
+thing_trigram_index = LetterIndex('ThingTrigrams', KEY_GLITTERBOT_THING_TRIGRAM_INDEX, terms=trigrams.trigrams)
+
+
+def update(maintenance_run: MaintenanceRun, full_rebuild=False):
     db = Database().connection
-    # Load the thing index
-    thing_index = db.smembers(KEY_THING_INDEX)
+    # Use the thing index loaded for this maintenance run
+    thing_index = list(maintenance_run.thing_hashes)
 
     # Get list of known languages
     languages = db.smembers(KEY_THING_LOCALE_KNOWN_LANGUAGES)
 
-    pipe = db.pipeline()
-
-    # Erase existing indices
-    fti_keys = [key for key in db.scan_iter(KEY_THING_LOCALE_FULL_TEXT_INDEX.format('*'), count=100000)]
-    if fti_keys:
-        pipe.delete(*fti_keys)
-        pipe.execute()
-
-    _build_thing_def_index(list(thing_index), db)
+    names = {}
 
     # For each language
     for language in languages:
 
-        Logger().log.debug('Updating thing name index for {}'.format(language))
+        Logger().log.debug('Fetching thing names for {}'.format(language))
 
         # For each thing, get the highest scoring localised name proposed
-        name_pipe = db.pipeline()
+        name_pipe = BoundedPipeline('Proposed names', keep_replies=True)
         for thing_hash in thing_index:
             name_pipe.zrevrange(KEY_THING_LOCALE_THING_NAMES.format(language, thing_hash), 0, 0, withscores=True)
-        results = name_pipe.execute()
-        hash_key_proposed_names = dict(zip(thing_index, results))
+        proposed_names = name_pipe.execute()
 
         # For each thing, get the current localised name
-        name_pipe = db.pipeline()
+        name_pipe = BoundedPipeline('Current names', keep_replies=True)
         for thing_hash in thing_index:
             name_pipe.get(KEY_THING_LOCALE_THING_NAME.format(language, thing_hash))
-        results = name_pipe.execute()
-        hash_key_current_names = dict(zip(thing_index, results))
+        current_names = name_pipe.execute()
+
+        names[language] = (proposed_names, current_names)
+
+    __update_names(maintenance_run, thing_index, names, full_rebuild)
+
+
+async def update_async(maintenance_run: MaintenanceRun, full_rebuild=False):
+    db = AsyncDatabase().connection
+    thing_index = list(maintenance_run.thing_hashes)
+
+    languages = list(await db.smembers(KEY_THING_LOCALE_KNOWN_LANGUAGES))
+
+    def proposed_name(language):
+        return lambda pipe, thing_hash: pipe.zrevrange(KEY_THING_LOCALE_THING_NAMES.format(language, thing_hash),
+                                                       0, 0, withscores=True)
+
+    def current_name(language):
+        return lambda pipe, thing_hash: pipe.get(KEY_THING_LOCALE_THING_NAME.format(language, thing_hash))
+
+    Logger().log.debug('Fetching thing names for {}'.format(', '.join(languages)))
+
+    # Proposed and current names for every language at the same time
+    fetches = []
+    for language in languages:
+        fetches.append(AsyncDatabase().execute_chunked(proposed_name(language), thing_index))
+        fetches.append(AsyncDatabase().execute_chunked(current_name(language), thing_index))
+    results = await asyncio.gather(*fetches)
+
+    names = {language: (results[index * 2], results[index * 2 + 1]) for index, language in enumerate(languages)}
+
+    __update_names(maintenance_run, thing_index, names, full_rebuild)
+
+
+def __update_names(maintenance_run: MaintenanceRun, thing_index, names, full_rebuild):
+    """Accepts new names, then updates the index. names is language -> (proposed names, current names)."""
+    pipe = BoundedPipeline('Accepted names')
+
+    # Letters of every name a thing is known by, and the names themselves
+    letters = {thing_hash: [] for thing_hash in thing_index}
+    texts = {thing_hash: [] for thing_hash in thing_index}
+
+    _build_thing_def_index(maintenance_run.all_things, letters, texts)
+
+    for language, (proposed_names, current_names) in names.items():
+
+        Logger().log.debug('Updating thing name index for {}'.format(language))
+
+        hash_key_proposed_names = dict(zip(thing_index, proposed_names))
+        hash_key_current_names = dict(zip(thing_index, current_names))
 
         # For each thing
         for thing_hash in thing_index:
@@ -75,38 +122,27 @@ def update():
 
             # Add name to the index if one can be set
             if name:
-                _update_index(pipe, name, thing_hash)
+                letters[thing_hash].append(_index_letters(name))
+                texts[thing_hash].append(name)
 
     # Execute
     pipe.execute()
 
+    thing_index_letters.update(((thing_hash, ''.join(parts)) for thing_hash, parts in letters.items()), full_rebuild)
 
-def _update_index(pipeline, string: str, thing_hash: str):
-    # Now split the new name and update the indices
-    letters = [c.lower() for c in string if c.isalnum()]
-
-    # Count how many times a letter occurs in the word
-    scores = Counter(letters)
+    # Names are kept apart so no trigram spans two of them
+    thing_trigram_index.update(((thing_hash, ' '.join(parts)) for thing_hash, parts in texts.items()), full_rebuild)
 
-    for letter, score in scores.items():
-        pipeline.zincrby(KEY_THING_LOCALE_FULL_TEXT_INDEX.format(letter), score, thing_hash)
 
-
-def _build_thing_def_index(thing_index, connection):
-    pipe = connection.pipeline()
-    # Process things, 1000 at a time so as not to murder memory.
-    for chunk in chunks(thing_index, 1000):
-        things = Thing.get_many_from_database_by_hash_without_history(chunk, connection)
-
-        for thing_hash, thing in things.items():
-            if thing is None:
-                Logger().log.error('Found {} with no metadata!'.format(thing_hash))
-                continue
-            _update_index(pipe, thing.FullName, thing.Hash)
-    pipe.execute()
+def _index_letters(string: str):
+    # Now split the new name, only letters and numbers are indexed
+    return ''.join(c.lower() for c in string if c.isalnum())
 
 
-def chunks(list_, n):
-    """Yield successive n-sized chunks from list_."""
-    for i in range(0, len(list_), n):
-        yield list_[i:i + n]
+def _build_thing_def_index(all_things, letters, texts):
+    for thing_hash, thing in all_things.items():
+        if thing is None:
+            Logger().log.error('Found {} with no metadata!'.format(thing_hash))
+            continue
+        letters.setdefault(thing.Hash, []).append(_index_letters(thing.FullName))
+        texts.setdefault(thing.Hash, []).append(thing.FullName)
@@ -1,5 +1,7 @@
 from typing import Dict
 
+from lib.async_database import AsyncDatabase
+from lib.bounded_pipeline import BoundedPipeline
 from lib.database import Database
 from lib.gwpcc import consts
 from lib.log import Logger
@@ -12,13 +14,28 @@ def check_integrity():
 
     Logger().log.info('Checking Thing:Index integrity')
 
-    pipe = connection.pipeline()
+    pipe = BoundedPipeline('Thing:Index check', keep_replies=True)
     for key in thing_index:
         pipe.exists(consts.KEY_THING_META.format(key))
     results = pipe.execute()
 
-    things: Dict[str, int] = dict(zip(thing_index, results))
+    __remove_missing(dict(zip(thing_index, results)))
 
+
+async def check_integrity_async():
+    connection = AsyncDatabase().connection
+
+    thing_index = list(await connection.smembers(consts.KEY_THING_INDEX))
+
+    Logger().log.info('Checking Thing:Index integrity')
+
+    results = await AsyncDatabase().execute_chunked(
+        lambda pipe, key: pipe.exists(consts.KEY_THING_META.format(key)), thing_index)
+
+    __remove_missing(dict(zip(thing_index, results)))
+
+
+def __remove_missing(things: Dict[str, int]):
     missing_keys = []
     for key, exists in things.items():
         if not exists:
@@ -26,7 +43,7 @@ def check_integrity():
             Logger().log.warning('Removing key {} as there is no matching metadata'.format(key))
 
     if missing_keys:
-        pipe = connection.pipeline()
+        pipe = Database().pipeline
         for key in missing_keys:
             pipe.srem(consts.KEY_THING_INDEX, key)
         pipe.execute()
@@ -1,102 +1,77 @@
-import csv
-import os
 import random
 import time
 from datetime import datetime, timedelta
 
+import settings
+from core.maintenance_run import MaintenanceRun
+from core.routines import pricing_engine
+from core.thing_record import as_thing
+from lib import trade_volume
 from lib.database import Database
 from lib.gwpcc import consts
-from lib.gwpcc.date_utils import get_today_date_string
 from lib.gwpcc.enums import TradeDirection
 from lib.gwpcc.qevent import event
 from lib.gwpcc.qevent.messages.sale import SaleMessage
 from lib.gwpcc.things.thing import Thing
 from lib.log import Logger
+from lib.price_report import PriceReport
 from lib.runtime_config import RuntimeConfig
 
 
-def perform_market_price_analysis():
-    connection = Database().connection
-    pipe = connection.pipeline()
-
-    all_thing_hashes = Database().connection.smembers(consts.KEY_THING_INDEX)
-
-    all_things = Thing.get_many_from_database_by_hash(all_thing_hashes, connection, get_today_date_string())
-
-    # Remove excluded items.
-    for hash_key in RuntimeConfig().ignored_thing_id_list:
-        if hash_key in all_things:
-            del all_things[hash_key]
+def perform_market_price_analysis(maintenance_run: MaintenanceRun):
+    all_things = maintenance_run.managed_things
 
     __trim_prices(all_things)
 
     __update_initial_prices(all_things)
 
-    __update_item_buy_prices(all_things)
+    if settings.USE_VECTORIZED_PRICING:
+        pricing_engine.update_item_prices(all_things, __demand(all_things))
+    else:
+        __update_item_buy_prices(all_things)
 
-    __update_item_sell_prices(all_things)
+        __update_item_sell_prices(all_things)
 
     __do_sale(all_things)
 
-    __write_data_to_CSV(all_things)
+    # Written in the background, maintenance_run.finish() waits for it
+    maintenance_run.price_report = __queue_price_report(all_things)
 
-    # Commit the data to the DB.
-    for thing in all_things.values():
-        thing.save_to_database(pipe)
-
-    if not RuntimeConfig().dry_run:
-        pipe.execute()
-
-
-def __write_data_to_CSV(all_things):
-    headers = ['thing_hash',
-               'bmv',
-               'buy_price_new',
-               'buy_price_old',
-               'buy_price_delta',
-               'sell_price_new',
-               'sell_price_old',
-               'sell_price_delta',
-               'qty_sold',
-               'qty_bought']
-
-    if os.name == 'nt':
-        csv_path = './'
-    else:
-        csv_path = '/var/log/glitterbot/'
 
-    csv_file = csv_path + '{}-{}-market-data.csv'.format(datetime.now().date().isoformat(), Database().market)
-
-    f = open(csv_file, "w", newline='')
-    writer = csv.DictWriter(f, fieldnames=headers)
-    writer.writeheader()
+def __queue_price_report(all_things) -> PriceReport:
+    report = PriceReport(Database().market)
 
     for thing in all_things.values():
         if thing.UseServerPrice:
-            row = {'thing_hash': thing.Hash,
-                   'bmv': thing.BaseMarketValue,
-                   'buy_price_delta': 0,
-                   'sell_price_delta': 0,
-                   'qty_sold': thing.TradeHistory[TradeDirection.ToPlayer],
-                   'qty_bought': thing.TradeHistory[TradeDirection.ToGWP]}
+            buy_price = round(thing.CurrentBuyPrice, 2)
+            sell_price = round(thing.CurrentSellPrice, 2)
 
             if thing.has_changed('CurrentBuyPrice'):
-                row['buy_price_old'] = round(thing.get_change('CurrentBuyPrice'), 2)
-                row['buy_price_delta'] = round(thing.CurrentBuyPrice - thing.get_change('CurrentBuyPrice'), 2)
+                buy_price_old = round(thing.get_change('CurrentBuyPrice'), 2)
+                buy_price_delta = round(thing.CurrentBuyPrice - thing.get_change('CurrentBuyPrice'), 2)
             else:
-                row['buy_price_old'] = round(thing.CurrentBuyPrice, 2)
-            row['buy_price_new'] = round(thing.CurrentBuyPrice, 2)
+                buy_price_old, buy_price_delta = buy_price, 0
 
             if thing.has_changed('CurrentSellPrice'):
-                row['sell_price_old'] = round(thing.get_change('CurrentSellPrice'), 2)
-                row['sell_price_delta'] = round(thing.CurrentSellPrice - thing.get_change('CurrentSellPrice'), 2)
+                sell_price_old = round(thing.get_change('CurrentSellPrice'), 2)
+                sell_price_delta = round(thing.CurrentSellPrice - thing.get_change('CurrentSellPrice'), 2)
             else:
-                row['sell_price_old'] = round(thing.CurrentSellPrice, 2)
-            row['sell_price_new'] = round(thing.CurrentSellPrice, 2)
+                sell_price_old, sell_price_delta = sell_price, 0
 
-            writer.writerow(row)
+            # Same order as the latest price_report.VERSIONS, earlier versions leave off the columns at the end
+            report.add((thing.Hash,
+                        thing.BaseMarketValue,
+                        buy_price,
+                        buy_price_old,
+                        buy_price_delta,
+                        sell_price,
+                        sell_price_old,
+                        sell_price_delta,
+                        thing.TradeHistory[TradeDirection.ToPlayer],
+                        thing.TradeHistory[TradeDirection.ToGWP],
+                        thing.Quantity)[:len(report.columns)])
 
-    f.close()
+    return report
 
 
 def __trim_prices(all_things):
@@ -118,11 +93,31 @@ def __update_initial_prices(all_things):
             __calculate_initial_price(thing)
 
 
+def __demand(all_things) -> dict:
+    """
+    Thing hash -> units sold the buy price is adjusted for, the mean over settings.PRICING_DEMAND_WINDOW days.
+
+    Empty, meaning today's trades, when the window is a day or nothing has been recorded in it yet.
+    """
+    if settings.PRICING_DEMAND_WINDOW == 1:
+        return {}
+
+    quantity_sold = trade_volume.average_sold(all_things.keys(), settings.PRICING_DEMAND_WINDOW)
+
+    if not quantity_sold:
+        Logger().log.warning('No trade volumes for the last {} days, pricing on today\'s trades'.format(
+            settings.PRICING_DEMAND_WINDOW))
+
+    return quantity_sold
+
+
 def __update_item_buy_prices(all_things):
-    price_breaks = RuntimeConfig().price_stock_break_points
+    price_breaks = RuntimeConfig().price_break_index
+
+    quantity_sold = __demand(all_things)
 
     # Get max price point
-    max_break = max(price_breaks, key=lambda x: x['PriceStop'])
+    max_break = price_breaks.max_break
 
     for thing in all_things.values():
 
@@ -130,8 +125,7 @@ def __update_item_buy_prices(all_things):
         if thing.UseServerPrice:
 
             # Look up the price point that matches the BMV
-            price_point = next(
-                (pp for pp in price_breaks if pp['PriceStart'] <= thing.BaseMarketValue <= pp['PriceStop']), None)
+            price_point = price_breaks.bracket_for(thing.BaseMarketValue)
 
             # If we didn't find one, the just skip it
             if price_point is None:
@@ -140,7 +134,7 @@ def __update_item_buy_prices(all_things):
                     'Defaulting to max break for {0}, Outside of known price ranges.'.format(thing))
                 price_point = max_break
 
-            __adjust_buy_price_based_on_trade_activity(thing, price_point)
+            __adjust_buy_price_based_on_trade_activity(thing, price_point, quantity_sold.get(thing.Hash))
 
             if thing.has_changed('CurrentBuyPrice'):
                 Logger().log.info('{0} Final result: Adjusting buy price of {1} from {2} to {3}'.format(
@@ -152,17 +146,16 @@ def __update_item_buy_prices(all_things):
 
 
 def __update_item_sell_prices(all_things):
-    price_breaks = RuntimeConfig().price_stock_break_points
+    price_breaks = RuntimeConfig().price_break_index
 
     # Get max price point
-    max_break = max(price_breaks, key=lambda x: x['PriceStop'])
+    max_break = price_breaks.max_break
 
     for thing in all_things.values():
         if thing.UseServerPrice:
 
             # Look up the price point that matches the BMV
-            price_point = next(
-                (pp for pp in price_breaks if pp['PriceStart'] <= thing.BaseMarketValue <= pp['PriceStop']), None)
+            price_point = price_breaks.bracket_for(thing.BaseMarketValue)
 
             # If we didn't find one, the just skip it
             if price_point is None:
@@ -183,8 +176,9 @@ def __update_item_sell_prices(all_things):
                 ))
 
 
-def __adjust_buy_price_based_on_trade_activity(thing: Thing, price_point):
-    quantity_sold = thing.TradeHistory[TradeDirection.ToPlayer]
+def __adjust_buy_price_based_on_trade_activity(thing: Thing, price_point, quantity_sold=None):
+    if quantity_sold is None:
+        quantity_sold = thing.TradeHistory[TradeDirection.ToPlayer]
 
     # Copy starting price.
     original_price = thing.CurrentBuyPrice
@@ -415,11 +409,12 @@ def __do_sale(all_things):
 
         thing = all_things[thing_hash]
 
-        sale_things.append({'thing': thing, 'discount': discount})
-
         thing.BuyPriceOverride = round(thing.CurrentBuyPrice - ((thing.CurrentBuyPrice / 100) * discount), 2)
         thing.SellPriceOverride = round(thing.CurrentSellPrice - ((thing.CurrentSellPrice / 100) * discount), 2)
 
+        # The message is built from full Things, made after the overrides so they're included
+        sale_things.append({'thing': as_thing(thing), 'discount': discount})
+
         Logger().log.debug("Thing {}, Discounted by {}%".format(thing, discount))
 
     msg = SaleMessage.prepare(Database().market, sale_things)
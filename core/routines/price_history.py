@@ -0,0 +1,17 @@
+from core.maintenance_run import MaintenanceRun
+from lib import price_history
+from lib.log import Logger
+from lib.runtime_config import RuntimeConfig
+
+
+def perform_price_history_update(maintenance_run: MaintenanceRun):
+    # The history records what was committed, nothing was on a dry run.
+    if RuntimeConfig().dry_run:
+        return
+
+    Logger().log.debug('Recording price history for {} Things'.format(len(maintenance_run.managed_things)))
+
+    price_history.record_things(maintenance_run.managed_things.values())
+
+    # Every Thing with days recorded, not only today's, or a Thing that drops out loses its unfinished periods
+    price_history.roll_up()
@@ -0,0 +1,237 @@
+import numpy as np
+
+from lib.gwpcc.enums import TradeDirection
+from lib.log import Logger
+from lib.runtime_config import RuntimeConfig
+
+
+def update_item_prices(all_things, quantity_sold=None):
+    """
+    Batched equivalent of market_values' per-Thing buy and sell price passes.
+
+    quantity_sold maps Thing hashes to the units sold buy prices follow, those missing use today's trades.
+
+    Every server priced Thing is loaded into columns, the buy prices are adjusted, then the sell prices are
+    adjusted against the new buy prices, exactly as the per-Thing functions would do it one Thing at a time.
+    """
+    things = [thing for thing in all_things.values() if thing.UseServerPrice]
+
+    if not things:
+        return
+
+    frame = MarketFrame(things, quantity_sold)
+
+    cap_buy_price, stock_max = frame.bracket_columns(RuntimeConfig().price_break_index)
+
+    cap_buy_price_integral = frame.integral_bracket_column(RuntimeConfig().price_break_index, 'CapBuyPrice')
+
+    buy_price, buy_assigned, buy_integral = adjust_buy_prices(frame.base_market_value,
+                                                              frame.current_buy_price,
+                                                              frame.quantity,
+                                                              frame.quantity_sold,
+                                                              cap_buy_price,
+                                                              (frame.base_market_value_integral,
+                                                               frame.current_buy_price_integral,
+                                                               cap_buy_price_integral))
+
+    sell_price, sell_assigned, sell_integral = adjust_sell_prices(frame.base_market_value,
+                                                                  frame.current_sell_price,
+                                                                  buy_price,
+                                                                  frame.quantity,
+                                                                  stock_max,
+                                                                  RuntimeConfig().minimum_sell_price_multiplier,
+                                                                  (frame.base_market_value_integral,
+                                                                   frame.current_sell_price_integral,
+                                                                   buy_integral))
+
+    frame.write_back('CurrentBuyPrice', buy_price, buy_assigned, buy_integral)
+    frame.write_back('CurrentSellPrice', sell_price, sell_assigned, sell_integral)
+
+    Logger().log.info('Pricing engine processed {} Things, {} buy and {} sell prices adjusted'.format(
+        len(things),
+        int(np.count_nonzero(buy_price != frame.current_buy_price)),
+        int(np.count_nonzero(sell_price != frame.current_sell_price))
+    ))
+
+
+class MarketFrame(object):
+    """Columnar copy of the fields the pricing passes read from a list of Things."""
+
+    def __init__(self, things, quantity_sold=None):
+        self.things = things
+        quantity_sold = quantity_sold or {}
+
+        count = len(things)
+
+        self.base_market_value = np.fromiter((t.BaseMarketValue for t in things), dtype=np.float64, count=count)
+        self.quantity = np.fromiter((t.Quantity for t in things), dtype=np.float64, count=count)
+        self.current_buy_price = np.fromiter((t.CurrentBuyPrice for t in things), dtype=np.float64, count=count)
+        self.current_sell_price = np.fromiter((t.CurrentSellPrice for t in things), dtype=np.float64, count=count)
+        # Where a field holds an int, the per-Thing functions can hand it on as an int, and Redis stores it so
+        self.base_market_value_integral = _integral(t.BaseMarketValue for t in things)
+        self.current_buy_price_integral = _integral(t.CurrentBuyPrice for t in things)
+        self.current_sell_price_integral = _integral(t.CurrentSellPrice for t in things)
+
+        self.quantity_sold = np.fromiter((quantity_sold.get(t.Hash, t.TradeHistory[TradeDirection.ToPlayer])
+                                          for t in things),
+                                         dtype=np.float64,
+                                         count=count)
+
+    def bracket_columns(self, price_breaks):
+        """
+        Returns the CapBuyPrice and StockMax of the price break matching each Thing's BaseMarketValue.
+
+        Falls back to the highest bracket when nothing matches.
+        """
+        positions = price_breaks.positions_for(self.base_market_value)
+
+        for index in np.flatnonzero(positions < 0):
+            Logger().log.info('Defaulting to max break for {0}, Outside of known price ranges.'.format(
+                self.things[index]))
+
+        return (price_breaks.column('CapBuyPrice', positions, price_breaks.max_break['CapBuyPrice']),
+                price_breaks.column('StockMax', positions, price_breaks.max_break['StockMax']))
+
+    def integral_bracket_column(self, price_breaks, field):
+        """Whether field of the price break matching each Thing's BaseMarketValue is an int."""
+        positions = price_breaks.positions_for(self.base_market_value)
+
+        return price_breaks.integral_column(field, positions, price_breaks.max_break[field])
+
+    def write_back(self, field, values, assigned, integral):
+        for index in np.flatnonzero(assigned):
+            thing = self.things[index]
+            original = getattr(thing, field)
+            setattr(thing, field, int(values[index]) if integral[index] else values[index].item())
+
+            if getattr(thing, field) != original:
+                Logger().log.debug('{0} Final result: Adjusting {1} of {2} from {3} to {4}'.format(
+                    '\u25B2' if getattr(thing, field) > original else '\u25BC',
+                    field,
+                    thing,
+                    original,
+                    getattr(thing, field)
+                ))
+
+
+def adjust_buy_prices(base_market_value, current_buy_price, quantity, quantity_sold, cap_buy_price, integral=None):
+    """
+    Vectorised market_values.__adjust_buy_price_based_on_trade_activity.
+
+    integral holds masks of where base_market_value, current_buy_price and cap_buy_price were ints. Returns the new
+    buy prices, a mask of the Things the per-Thing function would have assigned a price to, and a mask of where
+    that price would have been an int.
+    """
+    base_market_value_integral, current_buy_price_integral, cap_buy_price_integral = _masks(integral, 3,
+                                                                                            len(base_market_value))
+
+    one_percent_base_market_value = base_market_value / 100
+
+    total_stock = quantity + quantity_sold
+
+    max_price = base_market_value * cap_buy_price
+
+    # Fix overpriced items
+    over_cap = current_buy_price > max_price
+    original_price = np.where(over_cap, max_price, current_buy_price)
+
+    max_price_integral = base_market_value_integral & cap_buy_price_integral
+    original_integral = np.where(over_cap, max_price_integral, current_buy_price_integral)
+
+    # Skip DIV/0 if nothing sold and there's no stock.
+    units_sold = np.zeros_like(total_stock)
+    np.divide(quantity_sold, total_stock, out=units_sold, where=total_stock > 0)
+
+    # Less than 10% sold, take off 10% but never lower than base market price.
+    lowered_price = original_price - (one_percent_base_market_value * 10)
+    lowered_integral = (lowered_price < base_market_value) & base_market_value_integral
+    lowered_price = np.where(lowered_price < base_market_value, base_market_value, lowered_price)
+
+    # Otherwise raise it, clamped between 1 silver and the price cap.
+    increase = np.maximum(10, (units_sold - 1.10) * 100)
+    raised_price = original_price + (one_percent_base_market_value * increase)
+
+    # min() keeps the first of two equal values and max() the 1, the same goes for which one's type is kept
+    raised_integral = (max_price < raised_price) & max_price_integral
+    raised_price = np.minimum(raised_price, max_price)
+    raised_integral = np.where(raised_price > 1, raised_integral, True)
+    raised_price = np.maximum(1, raised_price)
+
+    low_sales = units_sold <= 0.1
+    calculated_price = np.where(low_sales, lowered_price, _round_prices(raised_price, ~low_sales))
+    calculated_integral = np.where(low_sales, lowered_integral, raised_integral)
+
+    changed = original_price != calculated_price
+
+    return (np.where(changed, _round_prices(calculated_price, changed), original_price),
+            over_cap | changed,
+            np.where(changed, calculated_integral, original_integral))
+
+
+def adjust_sell_prices(base_market_value, current_sell_price, current_buy_price, quantity, stock_max,
+                       minimum_sell_price_multiplier, integral=None):
+    """
+    Vectorised market_values.__adjust_sell_price_based_on_stock_quantity.
+
+    integral holds masks of where base_market_value, current_sell_price and current_buy_price were ints. Returns
+    the new sell prices, a mask of the Things the per-Thing function would have assigned a price to, and a mask of
+    where that price would have been an int.
+    """
+    base_market_value_integral, current_sell_price_integral, current_buy_price_integral = _masks(
+        integral, 3, len(base_market_value))
+
+    one_percent_base_market_value = base_market_value * 0.01
+
+    min_value = base_market_value * minimum_sell_price_multiplier
+
+    # round() on a float rounds half to even, as does rint.
+    units_in_stock = np.rint(quantity / stock_max)
+
+    # Low stock, raise the sell price 10% but never more than 150% market value.
+    raised_price = current_sell_price + (one_percent_base_market_value * 10)
+    raised_price = np.where(raised_price > 1.5 * base_market_value, 1.5 * base_market_value, raised_price)
+
+    # Overstocked, reduce it by up to 10%, but not below the minimum sell price.
+    reduction = np.minimum(10, (units_in_stock - 1) * 100)
+    lowered_price = current_sell_price - (one_percent_base_market_value * reduction)
+    lowered_integral = (lowered_price < min_value) & base_market_value_integral & isinstance(
+        minimum_sell_price_multiplier, int)
+    lowered_price = np.where(lowered_price < min_value, min_value, lowered_price)
+
+    # The raised price is always a float
+    calculated_price = np.where(units_in_stock <= 0.50,
+                                raised_price,
+                                np.where(units_in_stock > 1, lowered_price, current_sell_price))
+    calculated_integral = np.where(units_in_stock <= 0.50,
+                                   False,
+                                   np.where(units_in_stock > 1, lowered_integral, current_sell_price_integral))
+
+    # Sell price can not be higher than buy price.
+    over_buy_price = calculated_price > current_buy_price
+    calculated_price = np.where(over_buy_price, current_buy_price, calculated_price)
+    calculated_integral = np.where(over_buy_price, current_buy_price_integral, calculated_integral)
+
+    changed = current_sell_price != calculated_price
+
+    return (np.where(changed, _round_prices(calculated_price, changed), current_sell_price),
+            changed,
+            calculated_integral & changed)
+
+
+def _round_prices(prices, mask):
+    # numpy.round scales by 10^n before rounding, which can disagree with the builtin round() in the last bit,
+    # so hand the selected values to round() to keep prices identical to the per-Thing functions.
+    rounded = prices.copy()
+    rounded[mask] = [round(price, 2) for price in prices[mask].tolist()]
+    return rounded
+
+
+def _integral(values):
+    return np.fromiter((isinstance(value, int) for value in values), dtype=bool)
+
+
+def _masks(integral, count, length):
+    # Without masks every value is taken to be a float
+    if integral is None:
+        return [np.zeros(length, dtype=bool) for _ in range(count)]
+    return integral
@@ -1,39 +1,19 @@
 import random
 
-from lib.database import Database
-from lib.gwpcc import consts
-from lib.gwpcc.date_utils import get_today_date_string
+from core.maintenance_run import MaintenanceRun
 from lib.gwpcc.things.thing import Thing
 from lib.log import Logger
 from lib.runtime_config import RuntimeConfig
 
 
-def perform_stock_analysis():
-    connection = Database().connection
-    pipe = connection.pipeline()
-
-    all_thing_hashes = Database().connection.smembers(consts.KEY_THING_INDEX)
-
-    all_things = Thing.get_many_from_database_by_hash(all_thing_hashes, connection, get_today_date_string())
-
-    # Remove excluded items.
-    for hash_key in RuntimeConfig().ignored_thing_id_list:
-        if hash_key in all_things:
-            del all_things[hash_key]
-
-    for thing in all_things.values():
+def perform_stock_analysis(maintenance_run: MaintenanceRun):
+    for thing in maintenance_run.managed_things.values():
         __ensure_minimum_stock_level(thing)
         __trim_stock_level(thing)
-        thing.save_to_database(pipe)
-
-    if not RuntimeConfig().dry_run:
-        pipe.execute()
 
 
 def __ensure_minimum_stock_level(thing: Thing):
-    price_breaks = RuntimeConfig().price_stock_break_points
-    bracket = next((pp for pp in price_breaks if pp['PriceStart'] <= thing.BaseMarketValue <= pp['PriceStop']),
-                   None)
+    bracket = RuntimeConfig().price_break_index.bracket_for(thing.BaseMarketValue)
 
     if bracket is None:
         Logger().log.debug(
@@ -57,9 +37,7 @@ def __ensure_minimum_stock_level(thing: Thing):
 
 
 def __trim_stock_level(thing: Thing):
-    price_breaks = RuntimeConfig().price_stock_break_points
-    bracket = next((pp for pp in price_breaks if pp['PriceStart'] <= thing.BaseMarketValue <= pp['PriceStop']),
-                   None)
+    bracket = RuntimeConfig().price_break_index.bracket_for(thing.BaseMarketValue)
 
     if bracket is None:
         Logger().log.debug(
@@ -0,0 +1,14 @@
+from core.maintenance_run import MaintenanceRun
+from lib import trade_volume
+from lib.log import Logger
+from lib.runtime_config import RuntimeConfig
+
+
+def perform_trade_volume_update(maintenance_run: MaintenanceRun):
+    # Nothing is written on a dry run, pricing reads the totals as they were after the last run.
+    if RuntimeConfig().dry_run:
+        return
+
+    Logger().log.debug('Recording trade volumes for {} Things'.format(len(maintenance_run.managed_things)))
+
+    trade_volume.update(maintenance_run.managed_things.values())
@@ -0,0 +1,128 @@
+import sys
+from collections import Counter
+
+from lib.gwpcc import consts
+from lib.gwpcc.enums import TradeDirection
+from lib.gwpcc.things.thing import Thing
+
+
+class ThingRecord(object):
+    """
+    Compact snapshot of the parts of a Thing the maintenance routines use.
+
+    Reads and writes like a Thing for those routines, has_changed/get_change included, without a per-instance
+    __dict__, change log, TradeHistory dict or BMVVotes Counter. Trade counts and votes are kept as plain values
+    and only turned back into a dict/Counter when asked for.
+    """
+
+    # Fields the routines may change, compared against the values loaded to find what changed.
+    TRACKED = ('BaseMarketValue',
+               'CurrentBuyPrice',
+               'CurrentSellPrice',
+               'Quantity',
+               'UseServerPrice',
+               'BuyPriceOverride',
+               'SellPriceOverride')
+
+    __TRACKED_INDEX = {field: index for index, field in enumerate(TRACKED)}
+
+    __slots__ = ('Hash', 'Name', 'Quality', 'StuffType', 'FullName', 'MinifiedContainer',
+                 '_sold', '_bought', '_votes', '_original') + TRACKED
+
+    @classmethod
+    def from_thing(cls, thing: Thing):
+        record = cls()
+
+        record.Hash = thing.Hash
+        record.Name = thing.Name
+        # Only a handful of different qualities and stuffs, share the strings
+        record.Quality = sys.intern(thing.Quality) if thing.Quality else thing.Quality
+        record.StuffType = sys.intern(thing.StuffType) if thing.StuffType else thing.StuffType
+        record.FullName = thing.FullName
+        record.MinifiedContainer = thing.MinifiedContainer
+
+        for field in cls.TRACKED:
+            setattr(record, field, getattr(thing, field))
+
+        record._sold = thing.TradeHistory[TradeDirection.ToPlayer]
+        record._bought = thing.TradeHistory[TradeDirection.ToGWP]
+        record._votes = tuple(thing.BMVVotes.items()) if thing.BMVVotes else ()
+
+        record._original = tuple(getattr(record, field) for field in cls.TRACKED)
+
+        return record
+
+    @property
+    def TradeHistory(self) -> dict:
+        return {TradeDirection.ToPlayer: self._sold, TradeDirection.ToGWP: self._bought}
+
+    @property
+    def BMVVotes(self) -> Counter:
+        return Counter(dict(self._votes))
+
+    def has_changed(self, field) -> bool:
+        return getattr(self, field) != self._original[self.__TRACKED_INDEX[field]]
+
+    def get_change(self, field):
+        """The value field had when it was loaded."""
+        return self._original[self.__TRACKED_INDEX[field]]
+
+    def changed_fields(self) -> dict:
+        return {field: getattr(self, field) for field in self.TRACKED if self.has_changed(field)}
+
+    def save_to_database(self, pipe):
+        """Writes the fields GlitterBot manages back to the Thing's metadata."""
+        pipe.hset(consts.KEY_THING_META.format(self.Hash),
+                  mapping={field: encode_value(getattr(self, field)) for field in self.TRACKED})
+
+    def to_thing(self) -> Thing:
+        """A full Thing with this record's values, for code outside GlitterBot that expects one."""
+        thing = Thing.from_dict({
+            'Name': self.Name,
+            'Quality': self.Quality,
+            'StuffType': self.StuffType,
+            'BaseMarketValue': self.BaseMarketValue,
+            'MinifiedContainer': self.MinifiedContainer,
+            'UseServerPrice': self.UseServerPrice,
+            'CurrentBuyPrice': self.CurrentBuyPrice,
+            'CurrentSellPrice': self.CurrentSellPrice
+        })
+        thing.Quantity = self.Quantity
+        thing.BuyPriceOverride = self.BuyPriceOverride
+        thing.SellPriceOverride = self.SellPriceOverride
+
+        return thing
+
+    def __str__(self):
+        return self.FullName
+
+    def __repr__(self):
+        return 'ThingRecord({})'.format(self.Hash)
+
+
+def encode_value(value):
+    # redis-py won't take booleans, store them the way Database decodes them
+    return str(value) if isinstance(value, bool) else value
+
+
+def changed_fields(thing) -> dict:
+    """Fields GlitterBot manages that changed since thing was loaded, for ThingRecords and Things alike."""
+    if isinstance(thing, ThingRecord):
+        return thing.changed_fields()
+    return {field: getattr(thing, field) for field in ThingRecord.TRACKED if thing.has_changed(field)}
+
+
+def save_changes(thing, pipe, changes=None):
+    """HSETs only the changed fields of thing, returns how many were written."""
+    changes = changes if changes is not None else changed_fields(thing)
+
+    if changes:
+        pipe.hset(consts.KEY_THING_META.format(thing.Hash),
+                  mapping={field: encode_value(value) for field, value in changes.items()})
+
+    return len(changes)
+
+
+def as_thing(thing):
+    """Turns a ThingRecord into a Thing, Things are returned as they are."""
+    return thing.to_thing() if isinstance(thing, ThingRecord) else thing
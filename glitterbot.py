@@ -1,13 +1,18 @@
-from time import sleep
+import multiprocessing
+from multiprocessing.connection import wait
 
 #import sentry_sdk
 
 import settings
-from core.routines import market_values, stock_management
-from core.routines.indices import thing_name_index, colony_name_index, verify_thing_index
+from core.maintenance_run import MaintenanceRun
+from core.routines import market_values, price_history, stock_management, trade_volume
+from core.routines.indices import thing_name_index, colony_name_index, verify_thing_index, secondary_indices
+from lib.async_database import AsyncDatabase
 from lib.database import Database
 from lib.log import Logger
+from lib.metrics import Metrics
 from lib.runtime_config import RuntimeConfig
+from lib.scheduler import Scheduler
 
 
 def main():
@@ -22,77 +27,157 @@ def main():
         Database().connect_db(version)
         runtime_config.switch_context(version)
         runtime_config.verify_schema()
-    runtime_config.dry_run = settings.DEBUG_DRY_RUN
 
     if settings.DEBUG_FORCE_RUN_NOW:
         Logger().log.debug('Force run flag set')
 
-    while True:
+    # Markets share nothing, so each one runs in its own process with its own Database and RuntimeConfig.
+    log_queue = multiprocessing.Queue()
+    log_listener = Logger().listen(log_queue)
+
+    workers = {}
+    for version in settings.API_DB_CONFIG.keys():
+        worker = multiprocessing.Process(target=run_market, args=(version, log_queue), name=version)
+        worker.start()
+        workers[worker.sentinel] = worker
+
+    while workers:
+        for sentinel in wait(list(workers.keys())):
+            worker = workers.pop(sentinel)
+            worker.join()
+
+            if worker.exitcode != 0:
+                Logger().log.error('Maintenance worker for {} died, shutting down'.format(worker.name))
+                for other_worker in workers.values():
+                    other_worker.terminate()
+                    other_worker.join()
+                workers.clear()
+
+    log_listener.stop()
+
+    if settings.DEBUG_FORCE_RUN_NOW:
+        Logger().log.info('Force run flag was set, exiting.')
 
-        Logger().log.debug('Glitterbot Sleeping...')
-        sleep(5)
+
+def run_market(version, log_queue):
+    Logger().forward_to(log_queue)
+
+    runtime_config = RuntimeConfig()
+    runtime_config.dry_run = settings.DEBUG_DRY_RUN
+
+    # This process only ever talks to one market.
+    Database().connect_db(version)
+    runtime_config.switch_context(version)
+
+    scheduler = Scheduler(version)
+
+    while True:
 
         try:
 
-            for version in settings.API_DB_CONFIG.keys():
+            # Re-read bot settings from DB
+            runtime_config.reload()
 
-                # Connect to DB
-                Database().connect_db(version)
+            # Check if it's time to set up a maintenance window.
+            runtime_config.update_maintenance_window()
 
-                # Re-read bot settings from DB
-                runtime_config.switch_context(version)
+            if settings.DEBUG_FORCE_RUN_NOW or runtime_config.should_run():
+                run_maintenance(version)
 
-                # Check if it's time to set up a maintenance window.
-                runtime_config.update_maintenance_window()
+            if settings.DEBUG_FORCE_RUN_NOW:
+                return
+
+            # Nothing to do until the window needs setting up or it's time to run, unless woken
+            scheduler.sleep_until(runtime_config.next_wake_time())
 
-                if not settings.DEBUG_FORCE_RUN_NOW and not runtime_config.should_run():
-                    continue
+        except Exception:
+            Logger().log.exception('Fatal error in Main Loop')
+            quit(1)
 
-                Logger().log.info('Starting maintenance on {}'.format(version))
 
-                # Enable maintenance mode and set has_run flag to prevent multiple instances.
-                runtime_config.enable_maintenance_mode()
+def run_maintenance(version):
+    runtime_config = RuntimeConfig()
+    metrics = Metrics()
 
-                ###
-                # Thing Stuff
-                ###
+    Logger().log.info('Starting maintenance on {}'.format(version))
 
-                verify_thing_index.check_integrity()
+    # Enable maintenance mode and set has_run flag to prevent multiple instances.
+    runtime_config.enable_maintenance_mode()
 
-                # Update Prices
-                market_values.perform_market_price_analysis()
+    metrics.start_run(version)
 
-                # Update GWP Inventory
-                stock_management.perform_stock_analysis()
+    ###
+    # Thing Stuff
+    ###
 
-                # Update the indices
-                thing_name_index.update()
+    with metrics.phase('check_integrity'):
+        if settings.USE_ASYNC_REDIS:
+            AsyncDatabase().run(verify_thing_index.check_integrity_async)
+        else:
+            verify_thing_index.check_integrity()
 
-                ###
-                # Colony Stuff
-                ###
+    # Load the Things once for every routine below
+    with metrics.phase('load_things'):
+        maintenance_run = MaintenanceRun()
 
-                # Update the indices
-                colony_name_index.update()
+    # Rolling trade volumes, before pricing so smoothed demand includes today
+    if settings.TRADE_VOLUME_ENABLED:
+        with metrics.phase('trade_volume'):
+            trade_volume.perform_trade_volume_update(maintenance_run)
 
-                ###
-                # Done
-                ###
+    # Update Prices
+    with metrics.phase('market_price_analysis'):
+        market_values.perform_market_price_analysis(maintenance_run)
 
-                Logger().log.info('Glitterbot Exiting Maintenance Mode')
+    # Update GWP Inventory
+    with metrics.phase('stock_analysis'):
+        stock_management.perform_stock_analysis(maintenance_run)
 
-                # Exit Maintenance Mode
-                runtime_config.exit_maintenance_mode()
+    # Write back the fields that changed
+    with metrics.phase('commit_things') as phase:
+        phase.update(maintenance_run.commit())
 
-                Logger().log.info('Glitterbot Maintenance Done')
+    # Today's prices, stock and trades, rolled up into weeks and months as they finish
+    if settings.PRICE_HISTORY_ENABLED:
+        with metrics.phase('price_history'):
+            price_history.perform_price_history_update(maintenance_run)
 
-            if settings.DEBUG_FORCE_RUN_NOW:
-                Logger().log.info('Force run flag was set, exiting.')
-                quit()
+    # Update the indices
+    with metrics.phase('thing_name_index'):
+        if settings.USE_ASYNC_REDIS:
+            AsyncDatabase().run(thing_name_index.update_async, maintenance_run, settings.FULL_TEXT_INDEX_FULL_REBUILD)
+        else:
+            thing_name_index.update(maintenance_run, settings.FULL_TEXT_INDEX_FULL_REBUILD)
 
-        except Exception:
-            Logger().log.exception('Fatal error in Main Loop')
-            quit()
+    ###
+    # Colony Stuff
+    ###
+
+    # Update the indices
+    with metrics.phase('colony_name_index'):
+        colony_name_index.update(settings.FULL_TEXT_INDEX_FULL_REBUILD)
+
+    # Lookups for the ops scripts, orders by Thing and things needing attention
+    with metrics.phase('secondary_indices'):
+        secondary_indices.update(maintenance_run, settings.ORDER_INDEX_FULL_REBUILD)
+
+    # The price report has been writing in the background since the market analysis
+    with metrics.phase('price_report'):
+        maintenance_run.finish()
+
+    ###
+    # Done
+    ###
+
+    metrics.finish_run(Database().connection, Database().pool_stats())
+
+    Logger().log.info('Glitterbot Exiting Maintenance Mode')
+
+    # Exit Maintenance Mode
+    runtime_config.exit_maintenance_mode()
+
+    Logger().log.info('Glitterbot Maintenance Done')
 
 
-main()
+if __name__ == '__main__':
+    main()
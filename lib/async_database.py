@@ -0,0 +1,124 @@
+import asyncio
+
+import redis.asyncio
+from redis.asyncio.client import Pipeline
+
+import settings
+from lib.database import Database, add_decode_options
+from lib.metrics import Metrics
+
+# Replies decoded the same way as the blocking client
+DECODED_COMMANDS = ('GET', 'HGET', 'HGETALL', 'HMGET')
+
+
+class AsyncDecodingRedis(redis.asyncio.Redis):
+    """asyncio client counting commands towards Metrics and decoding replies like Database's client."""
+
+    async def execute_command(self, *args, **options):
+        Metrics().record_command(args)
+        add_decode_options(args, options)
+        return await super().execute_command(*args, **options)
+
+    def pipeline(self, transaction=True, shard_hint=None):
+        return AsyncDecodingPipeline(self.connection_pool, self.response_callbacks, transaction, shard_hint)
+
+
+class AsyncDecodingPipeline(Pipeline):
+
+    def execute_command(self, *args, **options):
+        add_decode_options(args, options)
+        return super().execute_command(*args, **options)
+
+    async def execute(self, raise_on_error=True):
+        Metrics().record_pipeline(self.command_stack)
+        return await super().execute(raise_on_error)
+
+
+class AsyncDatabase(object):
+    instance = None
+
+    def __new__(cls):
+        if not AsyncDatabase.instance:
+            AsyncDatabase.instance = AsyncDatabase.__AsyncDatabase()
+        return AsyncDatabase.instance
+
+    def __getattr__(self, name):
+        return getattr(self.instance, name)
+
+    def __setattr__(self, name, value):
+        return setattr(self.instance, name, value)
+
+    class __AsyncDatabase:
+        """
+        asyncio counterpart of Database for the async variants of the routines, see settings.USE_ASYNC_REDIS.
+
+        Connections belong to the event loop they were made on, so the client only lives as long as one run(),
+        which connects to Database's current market and closes the connections when the coroutine is done.
+        """
+
+        def __init__(self):
+            self.__db_connection = None
+
+        def run(self, coroutine_function, *args):
+            """Runs coroutine_function(*args) to completion in a new event loop, returns its result."""
+            return asyncio.run(self.__run(coroutine_function, *args))
+
+        async def __run(self, coroutine_function, *args):
+            self.__connect(Database().market)
+            try:
+                return await coroutine_function(*args)
+            finally:
+                await self.__close()
+
+        def __connect(self, version):
+            db_number = settings.API_DB_CONFIG[version]
+            blocking = Database().connection
+
+            pool_options = dict(blocking.connection_pool.connection_kwargs)
+            pool_options.update(db=db_number, decode_responses=True)
+
+            db = AsyncDecodingRedis(connection_pool=redis.asyncio.ConnectionPool(**pool_options))
+
+            # Same decoding as the blocking client
+            for command in DECODED_COMMANDS:
+                db.set_response_callback(command, blocking.response_callbacks[command])
+
+            self.__db_connection = db
+
+        async def __close(self):
+            await self.__db_connection.connection_pool.disconnect()
+            self.__db_connection = None
+
+        @property
+        def connection(self) -> redis.asyncio.Redis:
+
+            if self.__db_connection is None:
+                raise ValueError('Only available inside AsyncDatabase().run')
+
+            return self.__db_connection
+
+        @property
+        def pipeline(self):
+            return self.connection.pipeline()
+
+        async def execute_chunked(self, queue_command, items, chunk_size=5000) -> list:
+            """
+            Queues queue_command(pipe, item) for every item, in pipelines of chunk_size that run at the same time.
+
+            At most settings.ASYNC_REDIS_CONCURRENCY pipelines are in flight at once. Returns every reply in the
+            order of items.
+            """
+            items = list(items)
+            limit = asyncio.Semaphore(settings.ASYNC_REDIS_CONCURRENCY)
+
+            async def execute_chunk(chunk):
+                async with limit:
+                    pipe = self.pipeline
+                    for item in chunk:
+                        queue_command(pipe, item)
+                    return await pipe.execute()
+
+            chunks = await asyncio.gather(*(execute_chunk(items[start:start + chunk_size])
+                                            for start in range(0, len(items), chunk_size)))
+
+            return [reply for chunk in chunks for reply in chunk]
@@ -0,0 +1,114 @@
+import time
+from contextlib import contextmanager
+
+import settings
+from lib.database import Database
+from lib.log import Logger
+from lib.metrics import command_size
+
+
+class BoundedPipeline(object):
+    """
+    Pipeline that sends what it has queued whenever it reaches max_commands commands or max_bytes of arguments.
+
+    Use it like a redis-py pipeline. Calling execute() sends whatever is left. With transaction set, each flush is
+    wrapped in its own MULTI/EXEC, so the whole lot is no longer applied atomically. Commands queued inside a
+    group() always go out in the same flush.
+
+    Replies are thrown away unless keep_replies is set, in which case execute() returns all of them in order.
+    """
+
+    def __init__(self, name='Pipeline', connection=None, transaction=False, keep_replies=False,
+                 max_commands=None, max_bytes=None):
+        connection = connection if connection is not None else Database().connection
+
+        self._pipe = connection.pipeline(transaction=transaction)
+        self._name = name
+        self._keep_replies = keep_replies
+        self._replies = []
+        self._max_commands = max_commands or settings.PIPELINE_MAX_COMMANDS
+        self._max_bytes = max_bytes or settings.PIPELINE_MAX_BYTES
+        self._queued_bytes = 0
+        self._group_depth = 0
+
+        self.stats = {'Flushes': 0, 'Commands': 0, 'Bytes': 0, 'LargestFlush': 0, 'FlushTime': 0.0}
+
+    def __getattr__(self, name):
+        attribute = getattr(self._pipe, name)
+
+        if not callable(attribute):
+            return attribute
+
+        def queue(*args, **kwargs):
+            queued = len(self._pipe.command_stack)
+
+            result = attribute(*args, **kwargs)
+
+            for command_args, _ in self._pipe.command_stack[queued:]:
+                self._queued_bytes += command_size(command_args)
+
+            if not self._group_depth:
+                self.__flush_if_full()
+
+            # Keep chained calls going through us
+            return self if result is self._pipe else result
+
+        return queue
+
+    def __len__(self):
+        return len(self._pipe.command_stack)
+
+    @contextmanager
+    def group(self):
+        """Commands queued inside are sent in the same flush, e.g. everything one Thing saves."""
+        self._group_depth += 1
+        try:
+            yield self
+        finally:
+            self._group_depth -= 1
+
+        if not self._group_depth:
+            self.__flush_if_full()
+
+    def flush(self):
+        """Sends anything queued now, e.g. before reading back what was written."""
+        self.__flush()
+
+    def execute(self) -> list:
+        """Sends anything still queued, returns the replies of every flush if keep_replies is set."""
+        self.__flush()
+
+        Logger().log.debug('{} sent {} commands ({} bytes) in {} flushes, largest {}, took {:.3f}s'.format(
+            self._name,
+            self.stats['Commands'],
+            self.stats['Bytes'],
+            self.stats['Flushes'],
+            self.stats['LargestFlush'],
+            self.stats['FlushTime']))
+
+        replies = self._replies
+        self._replies = []
+        return replies
+
+    def __flush_if_full(self):
+        if len(self._pipe.command_stack) >= self._max_commands or self._queued_bytes >= self._max_bytes:
+            self.__flush()
+
+    def __flush(self):
+        commands = len(self._pipe.command_stack)
+        if not commands:
+            return
+
+        start = time.perf_counter()
+        replies = self._pipe.execute()
+
+        self.stats['Flushes'] += 1
+        self.stats['Commands'] += commands
+        self.stats['Bytes'] += self._queued_bytes
+        self.stats['LargestFlush'] = max(self.stats['LargestFlush'], commands)
+        self.stats['FlushTime'] += time.perf_counter() - start
+
+        self._queued_bytes = 0
+
+        if self._keep_replies:
+            self._replies.extend(replies)
@@ -0,0 +1,96 @@
+"""
+JSON encoding and decoding for everything GlitterBot reads and writes.
+
+Uses orjson or msgspec when one is installed and the standard library otherwise, pick one with
+settings.JSON_CODEC. Whatever the fast codec turns down when decoding, NaN/Infinity, huge ints and anything else
+the standard library accepts, is retried with the standard library, so decoded values never depend on which codec
+is installed. Output is compact JSON, the fast codecs write non-ASCII text as UTF-8 rather than escaping it and
+NaN/Infinity as null. orjson reads whole numbers too big for 64 bits as floats, that's put right for a value
+that is just a number but not inside documents.
+"""
+import json
+
+import settings
+
+_std_decoder = json.JSONDecoder()
+
+
+def _std_loads(s):
+    return _std_decoder.decode(s if isinstance(s, str) else s.decode('utf-8'))
+
+
+def _std_dumps(obj) -> str:
+    return json.dumps(obj, separators=(',', ':'))
+
+
+def _load_orjson():
+    import orjson
+
+    def loads(s):
+        value = orjson.loads(s)
+
+        # A float without a fraction or exponent was an integer too big for orjson
+        if type(value) is float:
+            text = s if isinstance(s, str) else s.decode('utf-8')
+            if not any(c in text for c in '.eENI'):
+                return _std_loads(text)
+
+        return value
+
+    def dumps(obj) -> str:
+        return orjson.dumps(obj).decode('utf-8')
+
+    return loads, dumps, (orjson.JSONDecodeError,), (orjson.JSONEncodeError,)
+
+
+def _load_msgspec():
+    import msgspec
+
+    encoder = msgspec.json.Encoder()
+    decoder = msgspec.json.Decoder()
+
+    def dumps(obj) -> str:
+        return encoder.encode(obj).decode('utf-8')
+
+    return decoder.decode, dumps, (msgspec.DecodeError,), (msgspec.EncodeError, TypeError, OverflowError)
+
+
+def _load_json():
+    return _std_loads, _std_dumps, (), ()
+
+
+_CODECS = {'orjson': _load_orjson, 'msgspec': _load_msgspec, 'json': _load_json}
+
+
+def _select(choice):
+    names = ['orjson', 'msgspec', 'json'] if choice == 'auto' else [choice]
+
+    for codec_name in names:
+        try:
+            return (codec_name,) + _CODECS[codec_name]()
+        except ImportError:
+            continue
+
+    raise ValueError('JSON codec {} is not installed'.format(choice))
+
+
+name, _fast_loads, _fast_dumps, _decode_errors, _encode_errors = _select(settings.JSON_CODEC)
+
+
+def loads(s):
+    """Decodes a JSON document from str or bytes, raises ValueError if it isn't one."""
+    try:
+        return _fast_loads(s)
+    except _decode_errors:
+        return _std_loads(s)
+
+
+def dumps(obj) -> str:
+    try:
+        return _fast_dumps(obj)
+    except _encode_errors:
+        return _std_dumps(obj)
+
+
+def load(fp):
+    return loads(fp.read())
@@ -1,8 +1,43 @@
-from json import JSONDecoder
-
 import redis
 import os
 import settings
+from lib import codec, schemas
+from lib.metrics import InstrumentedRedis, InstrumentedPipeline
+
+# Only JSON can start with one of these, anything else is left as a string without trying to decode it.
+# Includes the whitespace JSON allows and the start of NaN/Infinity/-Infinity.
+JSON_START = frozenset('{["-0123456789tfnNI \t\n\r')
+
+
+class DecodingRedis(InstrumentedRedis):
+    """Passes the key and fields of replies Database decodes on to the response callbacks, to find a schema."""
+
+    def execute_command(self, *args, **options):
+        add_decode_options(args, options)
+        return super().execute_command(*args, **options)
+
+    def pipeline(self, transaction=True, shard_hint=None):
+        return DecodingPipeline(self.connection_pool, self.response_callbacks, transaction, shard_hint)
+
+
+class DecodingPipeline(InstrumentedPipeline):
+
+    def execute_command(self, *args, **options):
+        add_decode_options(args, options)
+        return super().execute_command(*args, **options)
+
+
+def add_decode_options(args, options):
+    """Adds the key and fields of a command the response callbacks need to find its schema."""
+    command = args[0]
+    if command == 'HGETALL':
+        options['key'] = args[1]
+    elif command == 'HGET':
+        options['key'] = args[1]
+        options['field'] = args[2]
+    elif command == 'HMGET':
+        options['key'] = args[1]
+        options['fields'] = args[2:]
 
 
 class Database(object):
@@ -21,36 +56,82 @@ class Database(object):
 
     class __Database:
 
-        decoder = JSONDecoder()
-
         def __init__(self):
             self.__db_connection = None
+            self.__raw_connection = None
             self.__market = None
 
-        def connect_db(self, version):
+            # One pool per DB number and one client per market, kept for the life of the process.
+            self.__pools = {}
+            self.__clients = {}
+            self.__raw_clients = {}
+            self.__binary_clients = {}
+
+        def connect_db(self, version, connection_pool=None) -> redis.Redis:
+            """
+            Makes version the current market, returns its client.
+
+            Clients are created once per market and share one connection pool per DB number, so calling this
+            again just switches markets. A connection_pool replaces the configured server, the benchmarks use it
+            to run against fakeredis.
+            """
 
             if version in settings.API_DB_CONFIG:
                 db_number = settings.API_DB_CONFIG[version]
             else:
                 raise ValueError('Unknown API Version')
 
-            try:
-                ENV_GWP_DB_NAME = os.environ.get("ENV_GWP_DB_NAME")
-                ENV_GWP_DB_PORT = os.environ.get("ENV_GWP_DB_PORT")
-            except:
-                ENV_GWP_DB_NAME = settings.DATABASE_IP
-                ENV_GWP_DB_PORT = settings.DATABASE_PORT
-                
-            # Open and connect to the database, Decode responses in UTF-8 (default)
-            db = redis.Redis(ENV_GWP_DB_NAME, ENV_GWP_DB_PORT, decode_responses=True, db=db_number)
-            db.set_response_callback('GET', self.__parse_boolean_responses_get)
-            db.set_response_callback('HGET', self.__parse_boolean_responses_get)
-            db.set_response_callback('HGETALL', self.__parse_boolean_responses_hgetall)
-            db.set_response_callback('HMGET', self.__parse_boolean_responses_hgetall)
-
-            self.__db_connection = db
+            if connection_pool is not None or version not in self.__clients:
+                if connection_pool is None:
+                    connection_pool = self.__pool_for(db_number)
+
+                # Commands are counted towards the current maintenance phase, see lib.metrics
+                db = DecodingRedis(connection_pool=connection_pool)
+                db.set_response_callback('GET', self.__parse_boolean_responses_get)
+                db.set_response_callback('HGET', self.__parse_boolean_responses_hget)
+                db.set_response_callback('HGETALL', self.__parse_boolean_responses_hgetall)
+                db.set_response_callback('HMGET', self.__parse_boolean_responses_hmget)
+
+                self.__clients[version] = db
+
+                # Same connections, replies left as strings.
+                self.__raw_clients[version] = InstrumentedRedis(connection_pool=connection_pool)
+                self.__binary_clients.pop(version, None)
+
+            self.__db_connection = self.__clients[version]
+            self.__raw_connection = self.__raw_clients[version]
             self.__market = version
 
+            return self.__db_connection
+
+        def __pool_for(self, db_number) -> redis.ConnectionPool:
+            if db_number not in self.__pools:
+                try:
+                    ENV_GWP_DB_NAME = os.environ.get("ENV_GWP_DB_NAME")
+                    ENV_GWP_DB_PORT = os.environ.get("ENV_GWP_DB_PORT")
+                except:
+                    ENV_GWP_DB_NAME = settings.DATABASE_IP
+                    ENV_GWP_DB_PORT = settings.DATABASE_PORT
+
+                # Open and connect to the database, Decode responses in UTF-8 (default)
+                # Idle connections are checked before use, so one dropped overnight doesn't fail the run.
+                self.__pools[db_number] = redis.ConnectionPool(
+                    host=ENV_GWP_DB_NAME,
+                    port=ENV_GWP_DB_PORT,
+                    db=db_number,
+                    decode_responses=True,
+                    health_check_interval=settings.DATABASE_HEALTH_CHECK_INTERVAL)
+
+            return self.__pools[db_number]
+
+        def pool_stats(self) -> dict:
+            """Connections created, in use and idle for each DB number's pool."""
+            # redis-py has no public API for these
+            return {db_number: {'Created': pool._created_connections,
+                                'InUse': len(pool._in_use_connections),
+                                'Idle': len(pool._available_connections)}
+                    for db_number, pool in self.__pools.items()}
+
         @property
         def connection(self) -> redis.Redis:
 
@@ -59,6 +140,30 @@ class Database(object):
 
             return self.__db_connection
 
+        @property
+        def raw_connection(self) -> redis.Redis:
+            """Client for the current market that doesn't decode replies, for callers that only want strings."""
+
+            if self.__raw_connection is None:
+                raise ValueError('Please call connect_db first')
+
+            return self.__raw_connection
+
+        @property
+        def binary_connection(self) -> redis.Redis:
+            """Client for the current market with replies left as bytes, for packed binary values."""
+            if self.__db_connection is None:
+                raise ValueError('Please call connect_db first')
+
+            if self.__market not in self.__binary_clients:
+                # Same server and DB on a pool of its own, decode_responses is a setting of the pool.
+                pool = self.__db_connection.connection_pool
+                options = dict(pool.connection_kwargs, decode_responses=False)
+                self.__binary_clients[self.__market] = InstrumentedRedis(
+                    connection_pool=redis.ConnectionPool(connection_class=pool.connection_class, **options))
+
+            return self.__binary_clients[self.__market]
+
         @property
         def market(self) -> str:
             if self.__db_connection is None:
@@ -72,12 +177,19 @@ class Database(object):
 
             pipe = self.__db_connection.pipeline()
             pipe.set_response_callback('GET', self.__parse_boolean_responses_get)
-            pipe.set_response_callback('HGET', self.__parse_boolean_responses_get)
+            pipe.set_response_callback('HGET', self.__parse_boolean_responses_hget)
             pipe.set_response_callback('HGETALL', self.__parse_boolean_responses_hgetall)
-            pipe.set_response_callback('HMGET', self.__parse_boolean_responses_hgetall)
+            pipe.set_response_callback('HMGET', self.__parse_boolean_responses_hmget)
 
             return pipe
 
+        @property
+        def raw_pipeline(self):
+            if self.__raw_connection is None:
+                raise ValueError('Please call connect_db first')
+
+            return self.__raw_connection.pipeline()
+
         @classmethod
         def __try_auto_parse(cls, val):
             try:
@@ -88,23 +200,64 @@ class Database(object):
                     return True
                 elif val == "None":
                     return None
-                else:
-                    val = cls.decoder.decode(val)
+                elif val and val[0] in JSON_START:
+                    val = codec.loads(val)
             except Exception:
                 pass
             return val
 
         @classmethod
-        def __parse_boolean_responses_hgetall(cls, response, **options):
+        def __parse_field(cls, schema, field, val):
+            parser = schema.get(field)
+
+            if parser is not None:
+                try:
+                    return parser(val)
+                except ValueError:
+                    pass
+
+            return cls.__try_auto_parse(val)
+
+        @classmethod
+        def __parse_boolean_responses_hgetall(cls, response, key=None, **options):
             if not response:
                 return {}
 
-            for index in range(1, len(response), 2):
-                response[index] = cls.__try_auto_parse(response[index])
+            schema = schemas.schema_for(key)
+
+            if schema is None:
+                for index in range(1, len(response), 2):
+                    response[index] = cls.__try_auto_parse(response[index])
+            else:
+                for index in range(1, len(response), 2):
+                    response[index] = cls.__parse_field(schema, response[index - 1], response[index])
 
             it = iter(response)
             return dict(zip(it, it))
 
+        @classmethod
+        def __parse_boolean_responses_hmget(cls, response, key=None, fields=(), **options):
+            # HMGET replies with a plain list of values, None for missing fields.
+            schema = schemas.schema_for(key)
+
+            if schema is None:
+                return [None if val is None else cls.__try_auto_parse(val) for val in response]
+
+            return [None if val is None else cls.__parse_field(schema, field, val)
+                    for field, val in zip(fields, response)]
+
+        @classmethod
+        def __parse_boolean_responses_hget(cls, response, key=None, field=None, **options):
+            if not response:
+                return None
+
+            schema = schemas.schema_for(key)
+
+            if schema is None:
+                return cls.__try_auto_parse(response)
+
+            return cls.__parse_field(schema, field, response)
+
         @classmethod
         def __parse_boolean_responses_get(cls, response, **options):
             if not response:
@@ -0,0 +1,73 @@
+# Redis keys owned by GlitterBot, keys shared with the API live in lib.gwpcc.consts
+
+# Hash of item hash -> JSON letter counts last written to a full text index, formatted with the index name.
+KEY_GLITTERBOT_FTI_FINGERPRINTS = 'GlitterBot:FullTextIndex:{}:Fingerprints'
+
+# Temporary set of the items seen by an incremental update, formatted with the index name.
+KEY_GLITTERBOT_FTI_SEEN = 'GlitterBot:FullTextIndex:{}:Seen'
+
+# Counter used to number full text index rebuilds.
+KEY_GLITTERBOT_FTI_GENERATION = 'GlitterBot:FullTextIndex:{}:Generation'
+
+# Keys a rebuild writes into before they are renamed over the live ones, formatted with index name, generation, key.
+KEY_GLITTERBOT_FTI_SHADOW = 'GlitterBot:FullTextIndex:{}:Shadow:{}:{}'
+
+# Old live keys moved aside by a rebuild, formatted with index name, generation, key.
+KEY_GLITTERBOT_FTI_RETIRED = 'GlitterBot:FullTextIndex:{}:Retired:{}:{}'
+
+# Set of retired keys still waiting to be deleted.
+KEY_GLITTERBOT_FTI_RETIRED_KEYS = 'GlitterBot:FullTextIndex:{}:RetiredKeys'
+
+# List of JSON maintenance run summaries, newest first.
+KEY_GLITTERBOT_METRICS_RUNS = 'GlitterBot:Metrics:Runs'
+
+# Pub/sub channel that wakes a market's scheduler, formatted with the market.
+KEY_GLITTERBOT_CONTROL_CHANNEL = 'GlitterBot:Control:{}'
+
+# Sorted set of packed price history entries scored by day number, formatted with resolution and item hash.
+KEY_GLITTERBOT_PRICE_HISTORY = 'GlitterBot:PriceHistory:{}:{}'
+
+# Hash of resolution -> day number of the last period rolled up from the daily price history.
+KEY_GLITTERBOT_PRICE_HISTORY_ROLLED_UP = 'GlitterBot:PriceHistory:RolledUp'
+
+# Set of the item hashes with a daily price history, the ones whose weeks and months are rolled up.
+KEY_GLITTERBOT_PRICE_HISTORY_THINGS = 'GlitterBot:PriceHistory:Things'
+
+# Sorted set of the colonies containing a trigram, scored by how many times, formatted with the trigram.
+KEY_GLITTERBOT_COLONY_TRIGRAM_INDEX = 'GlitterBot:Trigrams:Colony:{}'
+
+# Sorted set of the Things whose names contain a trigram, scored by how many times, formatted with the trigram.
+KEY_GLITTERBOT_THING_TRIGRAM_INDEX = 'GlitterBot:Trigrams:Thing:{}'
+
+# Temporary intersection of the trigram sets of a query, formatted with a unique id.
+KEY_GLITTERBOT_TRIGRAM_QUERY = 'GlitterBot:Trigrams:Query:{}'
+
+# List of the items matching a search, cached for settings.SEARCH_CACHE_TTL, formatted with the kind and query.
+KEY_GLITTERBOT_SEARCH_CACHE = 'GlitterBot:Search:{}:{}'
+
+# Sorted set of the orders with an item in their manifest, scored by DateCreated, formatted with the item hash.
+KEY_GLITTERBOT_THING_ORDERS = 'GlitterBot:Index:ThingOrders:{}'
+
+# Set of the items in the item index with no metadata or an empty Name or FullName.
+KEY_GLITTERBOT_THINGS_MISSING_NAME = 'GlitterBot:Index:ThingsMissingName'
+
+# Hash of order id -> colony hash, for orders in a colony's order list with no manifest.
+KEY_GLITTERBOT_ORPHAN_ORDERS = 'GlitterBot:Index:OrphanOrders'
+
+# Where an index is built before it's renamed over the live key, formatted with the live key.
+KEY_GLITTERBOT_INDEX_BUILDING = '{}:Building'
+
+# Hash of colony hash -> [length, head, tail] of its order list when the Thing orders index last read it.
+KEY_GLITTERBOT_ORDER_INDEX_CURSORS = 'GlitterBot:Index:ThingOrderCursors'
+
+# Hash of colony hash -> newest DateCreated the Thing orders index has read from its order list.
+KEY_GLITTERBOT_ORDER_INDEX_HIGH_WATER = 'GlitterBot:Index:ThingOrderHighWater'
+
+# Hash of '<item hash>:Sold' and '<item hash>:Bought' -> number traded with players on a day, formatted with the date.
+KEY_GLITTERBOT_TRADE_VOLUME_DAY = 'GlitterBot:TradeVolume:Day:{}'
+
+# Hash of '<item hash>:Sold' and '<item hash>:Bought' -> totals over a rolling window, formatted with its days.
+KEY_GLITTERBOT_TRADE_VOLUME = 'GlitterBot:TradeVolume:{}Days'
+
+# Day number (days since 1970-01-01) the rolling trade volume windows were last brought up to.
+KEY_GLITTERBOT_TRADE_VOLUME_UPDATED = 'GlitterBot:TradeVolume:Updated'
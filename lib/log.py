@@ -47,6 +47,23 @@ class Logger(object):
 
             self._log_handle.addHandler(handler)
 
+        def listen(self, queue) -> logging.handlers.QueueListener:
+            """Writes records forwarded by worker processes through our own handlers."""
+            listener = logging.handlers.QueueListener(queue, *self._log_handle.handlers)
+            listener.start()
+            return listener
+
+        def forward_to(self, queue):
+            """Sends this process's records to the parent's listener instead of sharing its log files."""
+            for handler in list(self._log_handle.handlers):
+                self._log_handle.removeHandler(handler)
+                handler.close()
+
+            handler = logging.handlers.QueueHandler(queue)
+            handler.setFormatter(logging.Formatter('[%(processName)s] %(message)s'))
+
+            self._log_handle.addHandler(handler)
+
         @property
         def log(self):
             return self._log_handle
@@ -0,0 +1,154 @@
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+import redis
+from redis.client import Pipeline
+
+from lib import codec
+from lib.keys import KEY_GLITTERBOT_METRICS_RUNS
+from lib.log import Logger
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows
+    resource = None
+
+
+def command_size(args) -> int:
+    """Length of a command's arguments, close to but not exactly the bytes sent."""
+    return sum(len(arg) if isinstance(arg, (str, bytes)) else len(str(arg)) for arg in args)
+
+
+class Metrics(object):
+    instance = None
+
+    def __new__(cls):
+        if not Metrics.instance:
+            Metrics.instance = Metrics.__Metrics()
+        return Metrics.instance
+
+    def __getattr__(self, name):
+        return getattr(self.instance, name)
+
+    def __setattr__(self, name, value):
+        return setattr(self.instance, name, value)
+
+    class __Metrics:
+        """
+        Timings and Redis command counts for each phase of a maintenance run.
+
+        Commands are counted by the InstrumentedRedis client and pipelines Database hands out. Command bytes are
+        measured by command_size.
+        """
+
+        def __init__(self):
+            self._market = None
+            self._started = None
+            self._phases = []
+            self._current = None
+
+        def start_run(self, market):
+            self._market = market
+            self._started = int(time.time())
+            self._phases = []
+            self._current = None
+
+        @contextmanager
+        def phase(self, name):
+            phase = {'Name': name,
+                     'Commands': Counter(),
+                     'CommandBytes': 0,
+                     'Pipelines': 0,
+                     'PipelinedCommands': 0,
+                     'LargestPipeline': 0}
+
+            self._current = phase
+
+            wall_start = time.perf_counter()
+            cpu_start = time.process_time()
+            peak_rss_start = self.__peak_rss()
+
+            try:
+                yield phase
+            finally:
+                phase['WallTime'] = round(time.perf_counter() - wall_start, 3)
+                phase['CpuTime'] = round(time.process_time() - cpu_start, 3)
+                # The peak is the process's so far, a phase only shows up in the growth if it set a new one
+                phase['PeakRssSoFar'] = self.__peak_rss()
+                phase['PeakRssGrowth'] = None if peak_rss_start is None else round(
+                    phase['PeakRssSoFar'] - peak_rss_start, 1)
+
+                self._current = None
+                self._phases.append(phase)
+
+                Logger().log.debug('Phase {} took {}s ({}s CPU), {} commands'.format(
+                    name, phase['WallTime'], phase['CpuTime'], sum(phase['Commands'].values())))
+
+        def record_command(self, args):
+            if self._current is None:
+                return
+
+            self._current['Commands'][str(args[0]).upper()] += 1
+            self._current['CommandBytes'] += command_size(args)
+
+        def record_pipeline(self, command_stack):
+            if self._current is None:
+                return
+
+            for args, _ in command_stack:
+                self.record_command(args)
+
+            self._current['Pipelines'] += 1
+            self._current['PipelinedCommands'] += len(command_stack)
+            self._current['LargestPipeline'] = max(self._current['LargestPipeline'], len(command_stack))
+
+        def summary(self) -> dict:
+            return {'Market': self._market,
+                    'Started': self._started,
+                    'WallTime': round(sum(phase['WallTime'] for phase in self._phases), 3),
+                    'CpuTime': round(sum(phase['CpuTime'] for phase in self._phases), 3),
+                    'PeakRss': self.__peak_rss(),
+                    'Commands': sum(sum(phase['Commands'].values()) for phase in self._phases),
+                    'Phases': self._phases}
+
+        def finish_run(self, connection, pools=None, keep=100):
+            """Logs the run summary and stores it at the head of the runs list in Redis, with pools if given."""
+            summary = self.summary()
+            if pools is not None:
+                summary['ConnectionPools'] = pools
+            summary = codec.dumps(summary)
+
+            Logger().log.info('Maintenance metrics: {}'.format(summary))
+
+            pipe = connection.pipeline()
+            pipe.lpush(KEY_GLITTERBOT_METRICS_RUNS, summary)
+            pipe.ltrim(KEY_GLITTERBOT_METRICS_RUNS, 0, keep - 1)
+            pipe.execute()
+
+        @staticmethod
+        def __peak_rss():
+            # Peak resident set size of this process in MB so far, Linux reports it in KB.
+            if resource is None:
+                return None
+            return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+class InstrumentedRedis(redis.Redis):
+    """Redis client reporting every command it sends to Metrics."""
+
+    def execute_command(self, *args, **options):
+        Metrics().record_command(args)
+        return super().execute_command(*args, **options)
+
+    def pipeline(self, transaction=True, shard_hint=None):
+        return InstrumentedPipeline(self.connection_pool, self.response_callbacks, transaction, shard_hint)
+
+
+class InstrumentedPipeline(Pipeline):
+    """Pipeline reporting its size and commands to Metrics when executed."""
+
+    def execute(self, raise_on_error=True):
+        Metrics().record_pipeline(self.command_stack)
+        return super().execute(raise_on_error)
@@ -0,0 +1,64 @@
+from bisect import bisect_left
+
+import numpy as np
+
+
+class PriceBreakIndex(object):
+    """
+    Sorted lookup over the price break brackets stored in GlitterBot's config.
+
+    Brackets are ordered by PriceStop, a value belongs to the first bracket whose PriceStop is greater than or
+    equal to it, as long as the bracket's PriceStart is not above the value. For adjacent brackets this means a
+    value sitting exactly on a shared boundary (5, 25, 50, ...) belongs to the lower bracket, the one it closes.
+    Values below the first bracket, above the last one or inside a gap between brackets have no bracket.
+    """
+
+    def __init__(self, price_breaks):
+        self.brackets = sorted(price_breaks, key=lambda x: (x['PriceStop'], x['PriceStart']))
+
+        self._starts = [bracket['PriceStart'] for bracket in self.brackets]
+        self._stops = [bracket['PriceStop'] for bracket in self.brackets]
+
+        self._start_array = np.array(self._starts, dtype=np.float64)
+        self._stop_array = np.array(self._stops, dtype=np.float64)
+
+    def __len__(self):
+        return len(self.brackets)
+
+    @property
+    def max_break(self):
+        return self.brackets[-1] if self.brackets else None
+
+    def bracket_for(self, value):
+        """Returns the bracket containing value or None."""
+        position = bisect_left(self._stops, value)
+
+        if position < len(self._stops) and self._starts[position] <= value:
+            return self.brackets[position]
+
+        return None
+
+    def positions_for(self, values):
+        """Returns the position in self.brackets of the bracket containing each value, -1 where there is none."""
+        values = np.asarray(values, dtype=np.float64)
+
+        positions = np.searchsorted(self._stop_array, values, side='left')
+
+        found = positions < len(self.brackets)
+        found[found] = self._start_array[positions[found]] <= values[found]
+
+        return np.where(found, positions, -1)
+
+    def column(self, field, positions, default):
+        """Gathers field from the bracket at each position, using default where the position is -1."""
+        values = np.array([bracket[field] for bracket in self.brackets] + [default], dtype=np.float64)
+
+        # -1 indexes the default appended to the end.
+        return values[positions]
+
+    def integral_column(self, field, positions, default):
+        """Like column, but whether each value is an int, which column's floats can't tell."""
+        integral = np.array([isinstance(bracket[field], int) for bracket in self.brackets] + [isinstance(default, int)],
+                            dtype=bool)
+
+        return integral[positions]
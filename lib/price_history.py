@@ -0,0 +1,236 @@
+"""
+Per-Thing price history: buy and sell price, stock and trade volumes, at daily, weekly and monthly resolution.
+
+Each resolution is a sorted set per Thing. Members are packed binary entries that start with their period, scored
+by the day number (days since 1970-01-01) the period starts on, so any date range is one ZRANGEBYSCORE. Weeks start
+on Monday, months on the 1st.
+
+Days are recorded by the maintenance run. Once a week or month is over its days are rolled up into one entry,
+and days older than settings.PRICE_HISTORY_DAILY_RETENTION and weeks older than
+settings.PRICE_HISTORY_WEEKLY_RETENTION are trimmed. Months are kept.
+"""
+import struct
+from datetime import date, timedelta
+
+import settings
+from lib.bounded_pipeline import BoundedPipeline
+from lib.database import Database
+from lib.gwpcc.enums import TradeDirection
+from lib.keys import KEY_GLITTERBOT_PRICE_HISTORY, KEY_GLITTERBOT_PRICE_HISTORY_ROLLED_UP, \
+    KEY_GLITTERBOT_PRICE_HISTORY_THINGS
+
+DAILY = 'Daily'
+WEEKLY = 'Weekly'
+MONTHLY = 'Monthly'
+
+# Day number, buy price, sell price, quantity, sold to players, bought from players
+DAY_ENTRY = struct.Struct('<Iddiii')
+
+# Period start, days recorded, buy price mean/low/high, sell price mean/low/high, closing quantity, sold, bought
+ROLLUP_ENTRY = struct.Struct('<IHddddddiII')
+
+# Stock isn't in the older price reports, stored as this and read back as None
+QUANTITY_UNKNOWN = -2 ** 31
+
+EPOCH = date(1970, 1, 1)
+
+
+def day_number(day: date) -> int:
+    return (day - EPOCH).days
+
+
+def period_start(resolution, day: date) -> date:
+    if resolution == WEEKLY:
+        return day - timedelta(days=day.weekday())
+    if resolution == MONTHLY:
+        return day.replace(day=1)
+    return day
+
+
+def next_period(resolution, start: date) -> date:
+    if resolution == WEEKLY:
+        return start + timedelta(days=7)
+    if resolution == MONTHLY:
+        return (start + timedelta(days=32)).replace(day=1)
+    return start + timedelta(days=1)
+
+
+def pack_day(day: date, buy_price, sell_price, quantity, sold, bought) -> bytes:
+    return DAY_ENTRY.pack(day_number(day),
+                          buy_price,
+                          sell_price,
+                          QUANTITY_UNKNOWN if quantity is None else quantity,
+                          sold,
+                          bought)
+
+
+def record_day(pipe, thing_hash, day: date, buy_price, sell_price, quantity, sold, bought):
+    """Queues the day's entry for a Thing on a pipeline of Database().binary_connection, replacing any earlier one."""
+    key = KEY_GLITTERBOT_PRICE_HISTORY.format(DAILY, thing_hash)
+    score = day_number(day)
+
+    # Entries for the same day differ, so a second run that day would add another one
+    pipe.zremrangebyscore(key, score, score)
+    pipe.zadd(key, {pack_day(day, buy_price, sell_price, quantity, sold, bought): score})
+    pipe.sadd(KEY_GLITTERBOT_PRICE_HISTORY_THINGS, thing_hash)
+
+
+def record_things(things, day: date = None):
+    """Records day, today by default, for every Thing in things."""
+    day = day or date.today()
+
+    pipe = BoundedPipeline('Price history', connection=Database().binary_connection)
+
+    for thing in things:
+        with pipe.group():
+            record_day(pipe,
+                       thing.Hash,
+                       day,
+                       thing.CurrentBuyPrice,
+                       thing.CurrentSellPrice,
+                       thing.Quantity,
+                       thing.TradeHistory[TradeDirection.ToPlayer],
+                       thing.TradeHistory[TradeDirection.ToGWP])
+
+    pipe.execute()
+
+
+def __roll_up(start: date, days) -> bytes:
+    buy_prices = [entry[1] for entry in days]
+    sell_prices = [entry[2] for entry in days]
+
+    return ROLLUP_ENTRY.pack(day_number(start),
+                             len(days),
+                             sum(buy_prices) / len(days),
+                             min(buy_prices),
+                             max(buy_prices),
+                             sum(sell_prices) / len(days),
+                             min(sell_prices),
+                             max(sell_prices),
+                             days[-1][3],
+                             sum(entry[4] for entry in days),
+                             sum(entry[5] for entry in days))
+
+
+def __pending_periods(resolution, rolled_up, since, today):
+    """Starts of the finished periods of resolution that haven't been rolled up."""
+    current = period_start(resolution, today)
+
+    if since is not None:
+        start = period_start(resolution, since)
+    elif rolled_up.get(resolution) is not None:
+        start = next_period(resolution, EPOCH + timedelta(days=int(rolled_up[resolution])))
+    else:
+        start = period_start(resolution, today - timedelta(days=settings.PRICE_HISTORY_DAILY_RETENTION))
+
+    periods = []
+    while start < current:
+        periods.append(start)
+        start = next_period(resolution, start)
+
+    return periods
+
+
+def roll_up(thing_hashes=None, today: date = None, since: date = None, chunk_size=1000):
+    """
+    Rolls up the weeks and months that finished since the last time, then trims what's past its retention.
+
+    By default every Thing ever recorded is rolled up, not only the ones being maintained today, a period is only
+    rolled up once and its days are trimmed later. Everything from since on is rolled up again when it's given, the
+    backfill uses it. Each Thing's days are read once for both resolutions, so this costs one read per Thing, and
+    nothing on days no period finished.
+    """
+    today = today or date.today()
+    connection = Database().binary_connection
+
+    rolled_up = {field.decode('utf-8'): value for field, value in
+                 connection.hgetall(KEY_GLITTERBOT_PRICE_HISTORY_ROLLED_UP).items()}
+
+    pending = {resolution: __pending_periods(resolution, rolled_up, since, today) for resolution in (WEEKLY, MONTHLY)}
+    starts = [periods[0] for periods in pending.values() if periods]
+
+    if not starts:
+        return
+
+    # The days of every pending week and month
+    first = day_number(min(starts))
+    last = max(day_number(next_period(resolution, periods[-1]))
+               for resolution, periods in pending.items() if periods) - 1
+
+    if thing_hashes is None:
+        thing_hashes = [thing_hash.decode('utf-8') for thing_hash in
+                        connection.smembers(KEY_GLITTERBOT_PRICE_HISTORY_THINGS)]
+
+    thing_hashes = list(thing_hashes)
+    pipe = BoundedPipeline('Price history roll up', connection=connection)
+
+    for offset in range(0, len(thing_hashes), chunk_size):
+        chunk = thing_hashes[offset:offset + chunk_size]
+
+        read = connection.pipeline(transaction=False)
+        for thing_hash in chunk:
+            read.zrangebyscore(KEY_GLITTERBOT_PRICE_HISTORY.format(DAILY, thing_hash), first, last)
+
+        for thing_hash, members in zip(chunk, read.execute()):
+            days = sorted(DAY_ENTRY.unpack(member) for member in members)
+
+            for resolution, periods in pending.items():
+                key = KEY_GLITTERBOT_PRICE_HISTORY.format(resolution, thing_hash)
+
+                for start in periods:
+                    score = day_number(start)
+                    end = day_number(next_period(resolution, start))
+                    period_days = [entry for entry in days if score <= entry[0] < end]
+
+                    if period_days:
+                        with pipe.group():
+                            pipe.zremrangebyscore(key, score, score)
+                            pipe.zadd(key, {__roll_up(start, period_days): score})
+
+    # Past retention, already rolled up into the next resolution
+    daily_cutoff = '({}'.format(day_number(today - timedelta(days=settings.PRICE_HISTORY_DAILY_RETENTION)))
+    weekly_cutoff = '({}'.format(day_number(today - timedelta(weeks=settings.PRICE_HISTORY_WEEKLY_RETENTION)))
+    for thing_hash in thing_hashes:
+        pipe.zremrangebyscore(KEY_GLITTERBOT_PRICE_HISTORY.format(DAILY, thing_hash), '-inf', daily_cutoff)
+        pipe.zremrangebyscore(KEY_GLITTERBOT_PRICE_HISTORY.format(WEEKLY, thing_hash), '-inf', weekly_cutoff)
+
+    for resolution, periods in pending.items():
+        if periods:
+            pipe.hset(KEY_GLITTERBOT_PRICE_HISTORY_ROLLED_UP, resolution, day_number(periods[-1]))
+
+    pipe.execute()
+
+
+def get_history(thing_hash, resolution=DAILY, start: date = None, end: date = None) -> list:
+    """Entries of a Thing's history from start to end inclusive, oldest first, as dicts."""
+    members = Database().binary_connection.zrangebyscore(
+        KEY_GLITTERBOT_PRICE_HISTORY.format(resolution, thing_hash),
+        '-inf' if start is None else day_number(period_start(resolution, start)),
+        '+inf' if end is None else day_number(end))
+
+    if resolution == DAILY:
+        return [__day_dict(DAY_ENTRY.unpack(member)) for member in members]
+    return [__rollup_dict(ROLLUP_ENTRY.unpack(member)) for member in members]
+
+
+def __day_dict(entry) -> dict:
+    return {'Date': EPOCH + timedelta(days=entry[0]),
+            'BuyPrice': entry[1],
+            'SellPrice': entry[2],
+            'Quantity': None if entry[3] == QUANTITY_UNKNOWN else entry[3],
+            'Sold': entry[4],
+            'Bought': entry[5]}
+
+
+def __rollup_dict(entry) -> dict:
+    return {'Date': EPOCH + timedelta(days=entry[0]),
+            'Days': entry[1],
+            'BuyPrice': entry[2],
+            'BuyPriceLow': entry[3],
+            'BuyPriceHigh': entry[4],
+            'SellPrice': entry[5],
+            'SellPriceLow': entry[6],
+            'SellPriceHigh': entry[7],
+            'Quantity': None if entry[8] == QUANTITY_UNKNOWN else entry[8],
+            'Sold': entry[9],
+            'Bought': entry[10]}
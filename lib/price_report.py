@@ -0,0 +1,150 @@
+"""
+Per-run price change report, written by a background thread while maintenance carries on.
+
+Rows are tuples in the order of the report's columns, which depend on settings.PRICE_REPORT_VERSION, see VERSIONS.
+The format comes from settings.PRICE_REPORT_FORMAT:
+
+    csv       plain CSV, the original report
+    csv.gz    gzip compressed CSV
+    parquet   Parquet with zstd compression, needs pyarrow
+
+Files are written under a temporary name and renamed when complete, so readers never see half a report.
+"""
+import csv
+import gzip
+import os
+import queue
+import threading
+from datetime import datetime
+
+import settings
+from lib.log import Logger
+
+COLUMNS = ('thing_hash',
+           'bmv',
+           'buy_price_new',
+           'buy_price_old',
+           'buy_price_delta',
+           'sell_price_new',
+           'sell_price_old',
+           'sell_price_delta',
+           'qty_sold',
+           'qty_bought')
+
+# Report version -> its columns, each version only adds columns at the end
+VERSIONS = {1: COLUMNS,
+            2: COLUMNS + ('quantity',)}
+
+FORMATS = ('csv', 'csv.gz', 'parquet')
+
+# Rows handed to the writer thread at a time
+BATCH_SIZE = 5000
+
+
+def report_directory() -> str:
+    if settings.PRICE_REPORT_DIRECTORY:
+        return settings.PRICE_REPORT_DIRECTORY
+    return './' if os.name == 'nt' else '/var/log/glitterbot/'
+
+
+class PriceReport(object):
+    """
+    Use add() for each row and close() once there are no more, close() waits for the file to be finished.
+
+    Anything the writer thread raises is raised again by close().
+    """
+
+    def __init__(self, market, report_format=None, version=None):
+        report_format = report_format or settings.PRICE_REPORT_FORMAT
+        version = version or settings.PRICE_REPORT_VERSION
+
+        if report_format not in FORMATS:
+            raise ValueError('Unknown price report format {}, expected one of {}'.format(report_format, FORMATS))
+        if version not in VERSIONS:
+            raise ValueError('Unknown price report version {}, expected one of {}'.format(version, list(VERSIONS)))
+
+        self.path = os.path.join(report_directory(), '{}-{}-market-data.{}'.format(
+            datetime.now().date().isoformat(), market, report_format))
+        self.rows = 0
+        self.version = version
+        self.columns = VERSIONS[version]
+
+        self.__format = report_format
+        self.__batch = []
+        self.__queue = queue.Queue()
+        self.__error = None
+
+        # Fail now rather than in the thread
+        if report_format == 'parquet':
+            import pyarrow  # noqa: F401
+
+        self.__thread = threading.Thread(target=self.__run, name='PriceReport', daemon=True)
+        self.__thread.start()
+
+    def add(self, row: tuple):
+        self.__batch.append(row)
+        if len(self.__batch) >= BATCH_SIZE:
+            self.__queue.put(self.__batch)
+            self.__batch = []
+
+    def close(self):
+        if self.__batch:
+            self.__queue.put(self.__batch)
+            self.__batch = []
+
+        self.__queue.put(None)
+        self.__thread.join()
+
+        if self.__error is not None:
+            raise self.__error
+
+        Logger().log.debug('Price report of {} rows written to {}'.format(self.rows, self.path))
+
+    def __batches(self):
+        while True:
+            batch = self.__queue.get()
+            if batch is None:
+                return
+            self.rows += len(batch)
+            yield batch
+
+    def __run(self):
+        partial_path = self.path + '.part'
+        try:
+            if self.__format == 'parquet':
+                self.__write_parquet(partial_path)
+            else:
+                self.__write_csv(partial_path)
+            os.replace(partial_path, self.path)
+        except Exception as e:
+            self.__error = e
+            # Let close() return instead of waiting on a queue nobody reads
+            for _ in self.__batches():
+                pass
+
+    def __write_csv(self, path):
+        if self.__format == 'csv.gz':
+            f = gzip.open(path, 'wt', newline='', compresslevel=6)
+        else:
+            f = open(path, 'w', newline='')
+
+        with f:
+            writer = csv.writer(f)
+            writer.writerow(self.columns)
+            for batch in self.__batches():
+                writer.writerows(batch)
+
+    def __write_parquet(self, path):
+        import pyarrow
+        import pyarrow.parquet
+
+        schema = pyarrow.schema([('thing_hash', pyarrow.string())] +
+                                [(column, pyarrow.float64()) for column in self.columns[1:8]] +
+                                [(column, pyarrow.int64()) for column in self.columns[8:]])
+
+        with pyarrow.parquet.ParquetWriter(path, schema, compression='zstd') as writer:
+            for batch in self.__batches():
+                columns = list(zip(*batch))
+                writer.write_table(pyarrow.Table.from_arrays(
+                    [pyarrow.array(column, type=field.type) for column, field in zip(columns, schema)],
+                    schema=schema))
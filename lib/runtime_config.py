@@ -1,10 +1,11 @@
-import json
 from datetime import datetime, timezone, timedelta
 
+from lib import codec
 from lib.database import Database
 from lib.gwpcc import consts
 from lib.gwpcc.consts import KEY_THING_LOCALE_KNOWN_LANGUAGES
 from lib.log import Logger
+from lib.price_breaks import PriceBreakIndex
 
 
 class RuntimeConfig(object):
@@ -27,6 +28,8 @@ class RuntimeConfig(object):
             self._dry_run = False
             self._config_data = {}
             self._api_config = {}
+            self._price_break_index = None
+            self._price_break_indices = {}
             self.context = None
 
         def switch_context(self, api_version):
@@ -37,10 +40,20 @@ class RuntimeConfig(object):
                 self.__read_config_from_db()
 
             self._config_data = self._api_config[api_version]
+            self._price_break_index = self._price_break_indices[api_version]
+
+        def reload(self):
+            """Re-reads the bot settings of the current market, e.g. after an operator changed them."""
+            self.__read_config_from_db()
+            self.switch_context(self.context)
 
         def __read_config_from_db(self):
             self._api_config[self.context] = Database().connection.hgetall(consts.KEY_GLITTERBOT_DATA)
 
+            # Compile the price breaks once here rather than on every lookup.
+            self._price_break_indices[self.context] = PriceBreakIndex(
+                self._api_config[self.context].get(consts.KEY_GLITTERBOT_PRICEBREAKS, []))
+
             # Parse JSON lists/dicts
             # self._api_config[self.context][consts.KEY_GLITTERBOT_IGNORE_THINGS] = json.loads(
             #   self._api_config[self.context][consts.KEY_GLITTERBOT_IGNORE_THINGS])
@@ -69,6 +82,10 @@ class RuntimeConfig(object):
         def price_stock_break_points(self) -> list:
             return self._config_data[consts.KEY_GLITTERBOT_PRICEBREAKS]
 
+        @property
+        def price_break_index(self) -> PriceBreakIndex:
+            return self._price_break_index
+
         @property
         def minimum_sell_price_multiplier(self) -> float:
             return self._config_data[consts.KEY_GLITTERBOT_MIN_SELL_PRICE_MULTIPLIER]
@@ -128,6 +145,9 @@ class RuntimeConfig(object):
                                            consts.KEY_GLITTERBOT_MTIME_SET,
                                            "true")
 
+                # Pick up the new window
+                self.reload()
+
         def should_run(self) -> bool:
 
             # Are we at the right time?
@@ -144,6 +164,16 @@ class RuntimeConfig(object):
             else:
                 return False
 
+        def next_wake_time(self) -> float:
+            """UTC timestamp of the next time update_maintenance_window or should_run will have something to do."""
+            next_run = self._config_data[consts.KEY_GLITTERBOT_MTIME_NEXT]
+
+            if self._config_data[consts.KEY_GLITTERBOT_MTIME_SET]:
+                return next_run
+
+            # The window gets set up a preamble ahead of the run
+            return next_run - self._config_data[consts.KEY_GLITTERBOT_MTIME_PREABMLE]
+
         def verify_schema(self):
             Logger().log.debug('Checking/updating schema')
 
@@ -158,7 +188,7 @@ class RuntimeConfig(object):
             pipe.hsetnx(consts.KEY_GLITTERBOT_DATA, consts.KEY_GLITTERBOT_MTIME_SET, "false")
             pipe.hsetnx(consts.KEY_GLITTERBOT_DATA, consts.KEY_GLITTERBOT_BUY_PRICE_MULTIPLIER, "0.20")
             pipe.hset(consts.KEY_GLITTERBOT_DATA,
-                      consts.KEY_GLITTERBOT_IGNORE_THINGS, json.dumps(
+                      consts.KEY_GLITTERBOT_IGNORE_THINGS, codec.dumps(
                     ['8697f432058b914ba2b20c5bd6f0678548126e21', 'cdf9187a28bcb1b219a3a4aeaf3c99a65e7eb882'])
                       )
             pipe.hsetnx(consts.KEY_GLITTERBOT_DATA, consts.KEY_GLITTERBOT_SELL_PRICE_MULTIPLIER, "0.75")
@@ -219,4 +249,4 @@ class RuntimeConfig(object):
                 {'PriceStart': 100000, 'PriceStop': 200000, 'StockMin': 1, 'StockMax': 5, 'CapBuyPrice': 4.5}
             ]
 
-            pipe.hset(consts.KEY_GLITTERBOT_DATA, consts.KEY_GLITTERBOT_PRICEBREAKS, json.dumps(breakpoints))
+            pipe.hset(consts.KEY_GLITTERBOT_DATA, consts.KEY_GLITTERBOT_PRICEBREAKS, codec.dumps(breakpoints))
@@ -0,0 +1,67 @@
+import time
+
+import redis
+
+import settings
+from lib.database import Database
+from lib.gwpcc import consts
+from lib.keys import KEY_GLITTERBOT_CONTROL_CHANNEL
+from lib.log import Logger
+
+
+class Scheduler(object):
+    """
+    Sleeps a market's worker until its next maintenance event instead of polling.
+
+    Anything published on the market's control channel wakes it early, so an operator changing the config can
+    have it picked up straight away:
+
+        PUBLISH GlitterBot:Control:m1 reload
+
+    With SCHEDULER_KEYSPACE_NOTIFICATIONS set, changes to GlitterBot's config hash wake it too. That needs
+    notify-keyspace-events on the server to include K and h.
+    """
+
+    # Don't spin if the wake time has passed but there's still nothing to do, e.g. the API is in maintenance.
+    MIN_SLEEP = 5
+
+    def __init__(self, version):
+        self.version = version
+
+        self.channels = [KEY_GLITTERBOT_CONTROL_CHANNEL.format(version)]
+        if settings.SCHEDULER_KEYSPACE_NOTIFICATIONS:
+            self.channels.append('__keyspace@{}__:{}'.format(settings.API_DB_CONFIG[version],
+                                                              consts.KEY_GLITTERBOT_DATA))
+
+        self._pubsub = Database().connection.pubsub(ignore_subscribe_messages=True)
+        self._pubsub.subscribe(*self.channels)
+
+    def sleep_until(self, wake_time):
+        """Sleeps until wake_time, a UTC timestamp, SCHEDULER_MAX_SLEEP or a control message, whichever is first."""
+        timeout = min(max(wake_time - time.time(), self.MIN_SLEEP), settings.SCHEDULER_MAX_SLEEP)
+
+        Logger().log.debug('Glitterbot Sleeping for {:.0f} seconds...'.format(timeout))
+
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+
+            try:
+                message = self._pubsub.get_message(timeout=remaining)
+            except redis.ConnectionError:
+                # The next get_message reconnects and subscribes again.
+                Logger().log.warning('Lost the control channel for {}, retrying'.format(self.version))
+                time.sleep(min(remaining, self.MIN_SLEEP))
+                continue
+
+            if message is not None:
+                Logger().log.info('Woken by {} on {}'.format(message['data'], message['channel']))
+                self.__drain()
+                return
+
+    def __drain(self):
+        # A burst of changes only needs one wake up.
+        while self._pubsub.get_message() is not None:
+            pass
@@ -0,0 +1,77 @@
+from lib import codec
+from lib.gwpcc import consts
+
+# Field parsers for the hashes Database decodes. A parser raises ValueError for a value it can't handle, which
+# then gets the usual auto parsing instead, as does any field a schema doesn't list.
+
+
+def text(value):
+    # Same quick fix as the auto parsing, None was written as a string in places
+    return None if value == 'None' else value
+
+
+def number(value):
+    # Whole numbers stay ints, as they would from JSON
+    return int(value) if value.lstrip('-').isdigit() else float(value)
+
+
+def boolean(value):
+    if value in ('True', 'true'):
+        return True
+    if value in ('False', 'false'):
+        return False
+    raise ValueError(value)
+
+
+def json_value(value):
+    # Lists and dicts stored as JSON, decoded whatever they start with
+    return codec.loads(value)
+
+
+THING_META = {
+    'Name': text,
+    'Quality': text,
+    'StuffType': text,
+    'BaseMarketValue': number,
+    'CurrentBuyPrice': number,
+    'CurrentSellPrice': number,
+    'BuyPriceOverride': number,
+    'SellPriceOverride': number,
+    'Quantity': number,
+    'MinifiedContainer': boolean,
+    'UseServerPrice': boolean
+}
+
+COLONY_METADATA = {
+    'BaseName': text,
+    'Planet': text,
+    'FactionName': text
+}
+
+# Only the fields GlitterBot reads, the rest of an order is auto parsed as before
+ORDER_MANIFEST = {
+    'ThingsBoughtFromGwp': json_value,
+    'ThingsSoldToGwp': json_value,
+    'DateCreated': number
+}
+
+# Key format -> field schema
+SCHEMAS = {
+    consts.KEY_THING_META: THING_META,
+    consts.KEY_COLONY_METADATA: COLONY_METADATA,
+    consts.KEY_ORDER_MANIFEST: ORDER_MANIFEST
+}
+
+# Matched on the part of the key before the first placeholder
+_PREFIXES = [(key_format.split('{')[0], schema) for key_format, schema in SCHEMAS.items()]
+
+
+def schema_for(key):
+    if key is None:
+        return None
+
+    for prefix, schema in _PREFIXES:
+        if key.startswith(prefix):
+            return schema
+
+    return None
@@ -0,0 +1,123 @@
+"""
+Thing and colony search for scripts and support tools.
+
+Candidates come from the trigram indices the maintenance run builds, at most settings.SEARCH_CANDIDATE_LIMIT of
+them, best first. Each is checked against its actual text, and the hashes that really match are cached in Redis
+for settings.SEARCH_CACHE_TTL seconds, so paging through the results runs the search once. Only the display
+fields of the page asked for are fetched.
+
+Results are dicts:
+
+    Query       the query as given
+    Total       matches found
+    Truncated   True when there were more candidates than the limit, so there may be more matches
+    PrefixOnly  True when the query was too short to match inside a word, only words starting with it were found
+    Page        page number, from 0
+    PageSize    results per page
+    Results     list of dicts of Hash and the display fields, for this page
+"""
+import settings
+from lib import trigrams
+from lib.database import Database
+from lib.gwpcc.consts import KEY_COLONY_METADATA, KEY_THING_META, KEY_THING_LOCALE_KNOWN_LANGUAGES, \
+    KEY_THING_LOCALE_THING_NAME
+from lib.keys import KEY_GLITTERBOT_COLONY_TRIGRAM_INDEX, KEY_GLITTERBOT_THING_TRIGRAM_INDEX, \
+    KEY_GLITTERBOT_SEARCH_CACHE
+
+THING_DISPLAY_FIELDS = ['Name', 'Quality', 'StuffType', 'CurrentBuyPrice', 'CurrentSellPrice', 'Quantity']
+
+COLONY_DISPLAY_FIELDS = ['BaseName', 'Planet', 'FactionName', 'DateCreated', 'OwnerType', 'OwnerID']
+
+# Display fields a query is matched against
+THING_TEXT_FIELDS = ['Name', 'Quality', 'StuffType']
+COLONY_TEXT_FIELDS = ['BaseName', 'Planet', 'FactionName']
+
+
+def search_things(query: str, page=0, page_size=20) -> dict:
+    """Things with query in their name, quality, stuff or one of their translated names."""
+    return __search('Thing', query, page, page_size)
+
+
+def search_colonies(query: str, page=0, page_size=20) -> dict:
+    """Colonies with query in their base name, planet or faction."""
+    return __search('Colony', query, page, page_size)
+
+
+def __search(kind, query, page, page_size) -> dict:
+    connection = Database().connection
+    cache_key = KEY_GLITTERBOT_SEARCH_CACHE.format(kind, query.lower())
+    start = page * page_size
+
+    # Whether the candidates were cut off is kept at the head of the list, matches follow
+    cached = connection.lrange(cache_key, 0, 0)
+
+    if cached:
+        truncated = cached[0] == '1'
+        total = connection.llen(cache_key) - 1
+        hashes = connection.lrange(cache_key, start + 1, start + page_size)
+        results = __display(kind, hashes)
+    else:
+        matches, truncated = __find(kind, query)
+        total = len(matches)
+        results = [dict(display, Hash=item_hash) for item_hash, display in matches[start:start + page_size]]
+
+        if matches:
+            pipe = Database().pipeline
+            pipe.delete(cache_key)
+            pipe.rpush(cache_key, '1' if truncated else '0', *(item_hash for item_hash, _ in matches))
+            pipe.expire(cache_key, settings.SEARCH_CACHE_TTL)
+            pipe.execute()
+
+    return {'Query': query,
+            'Total': total,
+            'Truncated': truncated,
+            'PrefixOnly': trigrams.prefix_only(query),
+            'Page': page,
+            'PageSize': page_size,
+            'Results': results}
+
+
+def __find(kind, query):
+    """(hash, display fields) of the candidates that match query, best first, and whether candidates were cut off."""
+    index_key = KEY_GLITTERBOT_THING_TRIGRAM_INDEX if kind == 'Thing' else KEY_GLITTERBOT_COLONY_TRIGRAM_INDEX
+    text_fields = THING_TEXT_FIELDS if kind == 'Thing' else COLONY_TEXT_FIELDS
+
+    candidates = [item_hash for item_hash, _ in trigrams.search(index_key, query, settings.SEARCH_CANDIDATE_LIMIT)]
+    truncated = len(candidates) >= settings.SEARCH_CANDIDATE_LIMIT
+
+    displays = __fetch_display(kind, candidates)
+
+    # Translated names aren't display fields but are indexed, so they count as a match too
+    names = [[] for _ in candidates]
+    languages = list(Database().connection.smembers(KEY_THING_LOCALE_KNOWN_LANGUAGES)) if kind == 'Thing' else []
+    if languages and candidates:
+        pipe = Database().pipeline
+        for item_hash in candidates:
+            for language in languages:
+                pipe.get(KEY_THING_LOCALE_THING_NAME.format(language, item_hash))
+        replies = pipe.execute()
+        names = [replies[index:index + len(languages)] for index in range(0, len(replies), len(languages))]
+
+    query = query.lower()
+    matches = []
+    for item_hash, display, item_names in zip(candidates, displays, names):
+        texts = [display.get(field) for field in text_fields] + item_names
+        if any(query in str(text).lower() for text in texts if text is not None):
+            matches.append((item_hash, display))
+
+    return matches, truncated
+
+
+def __display(kind, hashes) -> list:
+    return [dict(display, Hash=item_hash) for item_hash, display in zip(hashes, __fetch_display(kind, hashes))]
+
+
+def __fetch_display(kind, hashes) -> list:
+    key = KEY_THING_META if kind == 'Thing' else KEY_COLONY_METADATA
+    fields = THING_DISPLAY_FIELDS if kind == 'Thing' else COLONY_DISPLAY_FIELDS
+
+    pipe = Database().pipeline
+    for item_hash in hashes:
+        pipe.hmget(key.format(item_hash), fields)
+
+    return [dict(zip(fields, values)) for values in pipe.execute()] if hashes else []
@@ -0,0 +1,164 @@
+"""
+Rolling trade volumes: how many of each Thing were sold to and bought from players over the last few days.
+
+Each day's volumes are kept in a hash for a little longer than the longest window. Every window in
+settings.TRADE_VOLUME_WINDOWS has a hash of running totals, fields '<Thing hash>:Sold' and '<Thing hash>:Bought',
+plus 'Days', the number of days recorded inside the window. The maintenance run adds the day's volumes to each
+window and takes off the days that just left it, so a run costs a read of those few day hashes, not 30 days of
+trade history per Thing. Running again the same day only applies the difference from the earlier run. After a gap
+of more than settings.TRADE_VOLUME_SPARE_DAYS days the days that left the windows may have expired, so the totals
+are summed again from the days still inside them.
+"""
+from collections import defaultdict
+from datetime import date, timedelta
+
+import settings
+from lib.bounded_pipeline import BoundedPipeline
+from lib.database import Database
+from lib.gwpcc.enums import TradeDirection
+from lib.keys import KEY_GLITTERBOT_TRADE_VOLUME, KEY_GLITTERBOT_TRADE_VOLUME_DAY, KEY_GLITTERBOT_TRADE_VOLUME_UPDATED
+from lib.log import Logger
+from lib.price_history import EPOCH, day_number
+
+SOLD = 'Sold'
+BOUGHT = 'Bought'
+
+# Window field counting the days recorded in it, and the marker every day hash has so it exists with no trades
+DAYS = 'Days'
+
+
+def update(things, day: date = None):
+    """Records the day's volumes, today by default, for every Thing in things and updates the rolling totals."""
+    day = day or date.today()
+    today = day_number(day)
+    windows = settings.TRADE_VOLUME_WINDOWS
+
+    connection = Database().raw_connection
+
+    volumes = {DAYS: 1}
+    for thing in things:
+        for field, direction in ((SOLD, TradeDirection.ToPlayer), (BOUGHT, TradeDirection.ToGWP)):
+            if thing.TradeHistory[direction]:
+                volumes['{}:{}'.format(thing.Hash, field)] = thing.TradeHistory[direction]
+
+    last = connection.get(KEY_GLITTERBOT_TRADE_VOLUME_UPDATED)
+    last = int(last) if last is not None else None
+
+    # Planned before today's hash is written, a second run today reads the earlier run's volumes
+    replace, window_values = plan(windows, last, today, volumes, __read_days)
+
+    pipe = BoundedPipeline('Trade volumes')
+
+    with pipe.group():
+        pipe.delete(KEY_GLITTERBOT_TRADE_VOLUME_DAY.format(__day_string(today)))
+        pipe.hset(KEY_GLITTERBOT_TRADE_VOLUME_DAY.format(__day_string(today)), mapping=volumes)
+        pipe.expire(KEY_GLITTERBOT_TRADE_VOLUME_DAY.format(__day_string(today)),
+                    timedelta(days=max(windows) + settings.TRADE_VOLUME_SPARE_DAYS))
+
+    for window, values in window_values.items():
+        if replace:
+            with pipe.group():
+                pipe.delete(KEY_GLITTERBOT_TRADE_VOLUME.format(window))
+                pipe.hset(KEY_GLITTERBOT_TRADE_VOLUME.format(window), mapping=values)
+        else:
+            for field, change in values.items():
+                if change:
+                    pipe.hincrby(KEY_GLITTERBOT_TRADE_VOLUME.format(window), field, change)
+
+    pipe.set(KEY_GLITTERBOT_TRADE_VOLUME_UPDATED, today)
+    pipe.execute()
+
+
+def plan(windows, last, today, volumes, read_days):
+    """
+    How to bring each window's totals from the last run's day to today, given today's volumes.
+
+    Returns (True, window -> totals) when the totals are to be replaced, (False, window -> changes) when the changes
+    are to be added to them. read_days takes day numbers and returns day number -> volumes, nothing for a missing day.
+    """
+    # A day leaving the 30 day window after a gap of more than the spare days has expired, so it can't be taken off.
+    # Days inside the windows are never that old, so summing them again always works.
+    if last is None or last > today or today - last > settings.TRADE_VOLUME_SPARE_DAYS:
+        Logger().log.debug('Summing the trade volume windows from the day hashes')
+
+        days = read_days(range(today - max(windows) + 1, today))
+        return True, {window: __sum_days([days.get(day, {}) for day in range(today - window + 1, today)], volumes)
+                      for window in windows}
+
+    if last == today:
+        # Only what moved since the earlier run today
+        earlier = read_days([today]).get(today, {})
+        change = defaultdict(int, volumes)
+        for field, value in earlier.items():
+            change[field] -= value
+        return False, {window: change for window in windows}
+
+    # Days in a window on the last run that aren't any more
+    leaving = {window: range(last - window + 1, today - window + 1) for window in windows}
+    days = read_days({day for days in leaving.values() for day in days})
+
+    changes = {}
+    for window in windows:
+        change = defaultdict(int, volumes)
+        for day in leaving[window]:
+            for field, value in days.get(day, {}).items():
+                change[field] -= value
+        changes[window] = change
+
+    return False, changes
+
+
+def __sum_days(days, volumes) -> dict:
+    totals = defaultdict(int, volumes)
+    for day_volumes in days:
+        for field, value in day_volumes.items():
+            totals[field] += value
+    return totals
+
+
+def __read_days(days) -> dict:
+    days = list(days)
+
+    pipe = Database().raw_pipeline
+    for day in days:
+        pipe.hgetall(KEY_GLITTERBOT_TRADE_VOLUME_DAY.format(__day_string(day)))
+
+    # Days with no hash, expired or never recorded, count as nothing
+    return {day: {field: int(value) for field, value in day_volumes.items()}
+            for day, day_volumes in zip(days, pipe.execute() if days else [])}
+
+
+def __day_string(day) -> str:
+    return (EPOCH + timedelta(days=day)).isoformat()
+
+
+def get_volumes(thing_hash) -> dict:
+    """A Thing's totals for each window, as window -> dict of Sold, Bought and the Days recorded in it."""
+    windows = settings.TRADE_VOLUME_WINDOWS
+
+    pipe = Database().raw_pipeline
+    for window in windows:
+        pipe.hmget(KEY_GLITTERBOT_TRADE_VOLUME.format(window),
+                   ['{}:{}'.format(thing_hash, SOLD), '{}:{}'.format(thing_hash, BOUGHT), DAYS])
+
+    return {window: dict(zip((SOLD, BOUGHT, DAYS), (int(value or 0) for value in values)))
+            for window, values in zip(windows, pipe.execute())}
+
+
+def average_sold(thing_hashes, window) -> dict:
+    """
+    Thing hash -> mean number sold to players a day over window, one read for all of them.
+
+    Empty when nothing has been recorded in the window yet.
+    """
+    thing_hashes = list(thing_hashes)
+    connection = Database().raw_connection
+
+    days = int(connection.hget(KEY_GLITTERBOT_TRADE_VOLUME.format(window), DAYS) or 0)
+    if not days or not thing_hashes:
+        return {}
+
+    sold = connection.hmget(KEY_GLITTERBOT_TRADE_VOLUME.format(window),
+                            ['{}:{}'.format(thing_hash, SOLD) for thing_hash in thing_hashes])
+
+    return {thing_hash: int(value or 0) / days for thing_hash, value in zip(thing_hashes, sold)}
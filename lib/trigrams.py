@@ -0,0 +1,90 @@
+import uuid
+
+from lib.database import Database
+from lib.keys import KEY_GLITTERBOT_TRIGRAM_QUERY
+
+
+def words(text: str) -> list:
+    """Lower cased runs of letters and digits, everything else separates words."""
+    return ''.join(c if c.isalnum() else ' ' for c in text.lower()).split()
+
+
+def trigrams(text: str) -> list:
+    """
+    Trigrams to index text under.
+
+    Words are padded with two spaces in front and one behind, so their first letter or two also make trigrams
+    that short queries can match as a prefix.
+    """
+    terms = []
+    for word in words(text):
+        padded = '  {} '.format(word)
+        terms.extend(padded[index:index + 3] for index in range(len(padded) - 2))
+    return terms
+
+
+def query_trigrams(query: str) -> set:
+    """
+    Trigrams every match of query contains.
+
+    A word can be anywhere inside a word of the text, unless the query has a separator next to it, then it must
+    start or end one and the padding trigrams are used on that side. When that leaves nothing, a query of one or
+    two letters, it falls back to matching the start of a word, see prefix_only.
+    """
+    terms = __inner_trigrams(query)
+
+    query_words = words(query)
+    if not terms and query_words:
+        padded = '  {}'.format(query_words[0])
+        terms.update(padded[offset:offset + 3] for offset in range(len(padded) - 2))
+
+    return terms
+
+
+def prefix_only(query: str) -> bool:
+    """True when query is too short to match inside a word, so only words starting with it are found."""
+    return bool(words(query)) and not __inner_trigrams(query)
+
+
+def __inner_trigrams(query):
+    text = ''.join(c if c.isalnum() else ' ' for c in query.lower())
+    query_words = text.split()
+
+    terms = set()
+    for index, word in enumerate(query_words):
+        starts = index > 0 or text[0] == ' '
+        ends = index < len(query_words) - 1 or text[-1] == ' '
+
+        padded = '{}{}{}'.format('  ' if starts else '', word, ' ' if ends else '')
+        terms.update(padded[offset:offset + 3] for offset in range(len(padded) - 2))
+
+    return terms
+
+
+def search(index_key: str, query: str, limit=500) -> list:
+    """
+    Items whose indexed text contains every trigram of query, as (item, score) best first, at most limit of them,
+    or all of them when limit is None.
+
+    The score is how many times the item has the query's trigrams. Trigrams can match out of order, so callers
+    check the candidates against the actual text.
+    """
+    keys = [index_key.format(term) for term in query_trigrams(query)]
+
+    if not keys:
+        return []
+
+    end = -1 if limit is None else limit - 1
+
+    if len(keys) == 1:
+        return Database().connection.zrevrange(keys[0], 0, end, withscores=True)
+
+    # Redis starts the intersection from the smallest set, so it only walks the rarest trigram's items.
+    temp_key = KEY_GLITTERBOT_TRIGRAM_QUERY.format(uuid.uuid4().hex)
+
+    pipe = Database().pipeline
+    pipe.zinterstore(temp_key, keys)
+    pipe.zrevrange(temp_key, 0, end, withscores=True)
+    pipe.delete(temp_key)
+
+    return pipe.execute()[1]
@@ -1,5 +1,4 @@
-import json
-
+from lib import codec
 from lib.database import Database
 from lib.gwpcc import consts
 from lib.gwpcc.things.thing import Thing
@@ -17,4 +16,4 @@ things = Thing.get_many_from_database(thing_list, connection)
 
 for thing in things.values():
     if thing.FromDatabase:
-        print(json.dumps(thing.to_dict()))
+        print(codec.dumps(thing.to_dict()))
@@ -1,5 +1,7 @@
 import settings
 from lib.database import Database
+from lib.gwpcc.consts import KEY_ORDER_MANIFEST
+from lib.keys import KEY_GLITTERBOT_ORPHAN_ORDERS
 
 for version in settings.API_DB_CONFIG.keys():
 
@@ -7,39 +9,14 @@ for version in settings.API_DB_CONFIG.keys():
 
     print(version)
 
-    # colonies = Database().connection.lrange(consts.COLON)
-
-    # all_thing_hashes = Database().connection.smembers(consts.KEY_THING_INDEX)
-    #
-    # all_things = Thing.get_many_from_database_by_hash(all_thing_hashes)
-    #
-    # pipe = Database().pipeline
-    # keys = []
-    # hashes = []
-    # for key in Database().connection.scan_iter('Things:Metadata:*'):
-    #     keys.append(key)
-    #     pipe.hgetall(key)
-    #
-    # results = dict(zip(keys, pipe.execute()))
-    #
-    # pipe = Database().pipeline
-    #
-    # for key, thing in results.items():
-    #     if 'Name' not in thing:
-    #         hashes.append(key.split(':')[2])
-    #         print('DEL {}'.format(key))
-    #         pipe.delete(key)
-    #
-    # pipe.execute()
+    # Orders in a colony's order list with no manifest, found by the last maintenance run
+    orphans = Database().connection.hgetall(KEY_GLITTERBOT_ORPHAN_ORDERS)
 
+    # Some may have been written since
     pipe = Database().pipeline
-    keys = []
-    for key in Database().connection.scan_iter('Orders:Colony:*All'):
-        keys.append(key)
-        pipe.hgetall(key)
-
-    results = dict(zip(keys, pipe.execute()))
+    for order_id in orphans:
+        pipe.exists(KEY_ORDER_MANIFEST.format(order_id))
 
-    for key, orders in results.items():
-        for order in orders:
-            exists = Database().connection.exists(order)
+    for (order_id, colony_hash), exists in zip(orphans.items(), pipe.execute()):
+        if not exists:
+            print('Colony {} lists order {} which has no manifest'.format(colony_hash, order_id))
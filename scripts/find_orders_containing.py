@@ -1,9 +1,17 @@
-import json
-from typing import Dict
+from datetime import datetime
 
+from lib import codec
 from lib.database import Database
+from lib.gwpcc.consts import KEY_ORDER_MANIFEST
+from lib.keys import KEY_GLITTERBOT_THING_ORDERS
 
 name = input('Thing hash: ').lower()
+since = input('Since (YYYY-MM-DD, blank for all): ').strip()
+before = input('Before (YYYY-MM-DD, blank for all): ').strip()
+
+# The index is scored by DateCreated
+low = datetime.strptime(since, '%Y-%m-%d').timestamp() if since else '-inf'
+high = '({}'.format(datetime.strptime(before, '%Y-%m-%d').timestamp()) if before else '+inf'
 
 output = open('output.json', 'w')
 
@@ -11,44 +19,16 @@ for version in ['u1']:
     print("*********** Searching {} ***********".format(version))
     Database().connect_db(version)
 
-    key_iter = Database().connection.scan_iter('Orders:Manifest:*', count=1000)
-
-    meta_keys = list(key_iter)
-
-    pipe = Database().connection.pipeline()
-    for key in meta_keys:
-        pipe.hgetall(key)
-    results = pipe.execute()
-
-    order_data: Dict[str, Dict[str, str]] = dict(zip(meta_keys, results))
-
-    orders = []
-
-    for order in order_data.values():
-
-        try:
-            bought = json.loads(order['ThingsBoughtFromGwp'])
-        except:
-            bought = {}
-
-        try:
-            sold = json.loads(order['ThingsSoldToGwp'])
-        except:
-            sold = {}
+    # Orders indexed by the maintenance run, see core.routines.indices.secondary_indices
+    order_ids = Database().connection.zrangebyscore(KEY_GLITTERBOT_THING_ORDERS.format(name), low, high)
 
-        has_match = False
-        for thing in bought:
-            if thing['Hash'] == name:
-                has_match = True
-                break
-        for thing in sold:
-            if thing['Hash'] == name:
-                has_match = True
-                break
+    pipe = Database().raw_pipeline
+    for order_id in order_ids:
+        pipe.hgetall(KEY_ORDER_MANIFEST.format(order_id))
 
-        if has_match:
-            orders.append(order)
+    # Orders deleted since they were indexed come back empty
+    orders = [order for order in pipe.execute() if order]
 
     if len(orders) > 0:
         orders = sorted(orders, key=lambda x: x['DateCreated'])
-        output.writelines(json.dumps(orders))
+        output.writelines(codec.dumps(orders))
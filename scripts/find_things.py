@@ -1,6 +1,5 @@
-from typing import Dict
-
 import settings
+from lib import search
 from lib.database import Database
 
 name = input('Name? ').lower()
@@ -9,17 +8,19 @@ for version in settings.API_DB_CONFIG.keys():
     print("*********** Searching {} ***********".format(version))
     Database().connect_db(version)
 
-    key_iter = Database().connection.scan_iter('Things:Metadata:*', 10000)
-
-    meta_keys = list(key_iter)
+    page = 0
+    while True:
+        results = search.search_things(name, page)
 
-    pipe = Database().connection.pipeline()
-    for key in meta_keys:
-        pipe.hgetall(key)
-    results = pipe.execute()
+        for thing in results['Results']:
+            print(thing)
 
-    things: Dict[str, Dict[str, str]] = dict(zip(meta_keys, results))
+        # Further pages only when asked for
+        if (page + 1) * results['PageSize'] >= results['Total'] or input('More (y/n)? ').lower() != 'y':
+            break
+        page += 1
 
-    for thing in things.values():
-        if thing['Name'].lower().find(name) > -1:
-            print(thing)
+    if results['Truncated']:
+        print('Too many candidates, not every match was checked, search more specific')
+    if results['PrefixOnly']:
+        print('Searches under three letters only match the start of a word')
@@ -1,11 +1,10 @@
-import json
-from datetime import datetime
 from timeit import default_timer as timer
 from typing import Dict
 
+from lib import codec, search
 from lib.database import Database
 from lib.gwpcc.consts import KEY_COLONY_METADATA, KEY_COLONY_ALL_ORDERS, KEY_ORDER_MANIFEST, \
-    KEY_COLONY_FTMP_INDEX, KEY_COLONY_FULL_TEXT_INDEX, KEY_COLONY_INDEX_BY_STEAM_ID
+    KEY_COLONY_INDEX_BY_STEAM_ID
 
 db_name = input('Which DB: ').lower()
 
@@ -57,50 +56,52 @@ def search_by_name():
 
         if name:
 
-            temp_key = KEY_COLONY_FTMP_INDEX.format(datetime.utcnow().timestamp())
-            pipe = db.pipeline()
-            sets = list(map(lambda key: KEY_COLONY_FULL_TEXT_INDEX.format(key), [c for c in name if c.isalnum()]))
-            pipe.zunionstore(temp_key, sets)
-            pipe.zrevrangebyscore(temp_key, '+inf', 0, withscores=True)
-            pipe.delete(temp_key)
-            start = timer()
-            results = pipe.execute()
-            end = timer()
-            print('Query took {0:.4f}'.format(end - start))
-
-            if results and results[1]:
-                pipe = db.pipeline()
-                colony_keys = [colony_hash[0] for colony_hash in results[1]]
-                list(map(lambda colony_hash: pipe.hgetall(KEY_COLONY_METADATA.format(colony_hash)), colony_keys))
-                colony_results = dict(zip(colony_keys, pipe.execute()))
-
-                print('Matches: ')
+            lookup = ''
+            page = 0
+            while True:
                 start = timer()
-                for colony_hash, colony_data in colony_results.items():
-                    if any(str(colony_data[key]).find(name) > -1 for key in data_keys):
-                        print(
-                            'Hash: {} Colony Name: {}, Faction: {}, Planet: {}, Created: {}, Owner Type {}, Owner ID {}'.format(
-                                colony_hash,
-                                colony_data['BaseName'],
-                                colony_data['FactionName'],
-                                colony_data['Planet'],
-                                colony_data['DateCreated'],
-                                colony_data['OwnerType'],
-                                colony_data['OwnerID']
-                            ))
+                results = search.search_colonies(name, page)
                 end = timer()
-                print('Filter took {0:.4f}'.format(end - start))
-                lookup = input('Choose Hash or press enter to refine: ')
-                if lookup:
+                print('Query took {0:.4f}'.format(end - start))
+
+                if results['PrefixOnly'] and page == 0:
+                    print('Searches under three letters only match the start of a word')
+
+                if not results['Results']:
                     break
-            else:
+
+                print('Matches {}-{} of {}{}: '.format(
+                    page * results['PageSize'] + 1,
+                    page * results['PageSize'] + len(results['Results']),
+                    results['Total'],
+                    ', search more specific for the rest' if results['Truncated'] else ''))
+                for colony_data in results['Results']:
+                    print(
+                        'Hash: {} Colony Name: {}, Faction: {}, Planet: {}, Created: {}, Owner Type {}, Owner ID {}'.format(
+                            colony_data['Hash'],
+                            colony_data['BaseName'],
+                            colony_data['FactionName'],
+                            colony_data['Planet'],
+                            colony_data['DateCreated'],
+                            colony_data['OwnerType'],
+                            colony_data['OwnerID']
+                        ))
+
+                lookup = input('Choose Hash, n for the next page or press enter to refine: ')
+                if lookup != 'n':
+                    break
+                lookup = ''
+                page += 1
+
+            if lookup:
+                break
+
+            if not results['Total']:
                 print('Nothing found, try again')
 
     return lookup
 
 
-data_keys = ['BaseName', 'Planet', 'FactionName']
-
 t = input('Steam ID or Search?').lower().strip()
 
 if t == 'steam':
@@ -123,4 +124,4 @@ orders = list(order_data.values())
 
 if len(orders) > 0:
     orders = sorted(orders, key=lambda x: x['DateCreated'])
-    output.writelines(json.dumps(orders))
+    output.writelines(codec.dumps(orders))
@@ -1,6 +1,5 @@
-from datetime import datetime, timedelta
-
 import settings
+from lib import trade_volume
 from lib.database import Database
 from lib.gwpcc.things.thing import Thing
 
@@ -19,22 +18,11 @@ for version in settings.API_DB_CONFIG.keys():
         print("Database: {}, Found {}".format(version, loaded_thing))
         print(vars(loaded_thing))
 
-        day = datetime.utcnow()
-
-        for d in range(0, 10):
-            delta = timedelta(days=d)
-            day = (datetime.utcnow() - delta).strftime('%Y-%m-%d')
-            loaded_thing = Thing.get_from_database({'Name': name,
-                                                    'Quality': quality if quality != "" else None,
-                                                    'StuffType': stuff if stuff != "" else None,
-                                                    }, connection, date=day)
-
-            print(day)
-            for direction in loaded_thing.TradeHistory.keys():
-                print(direction)
-                print(loaded_thing.TradeHistory[direction])
-            print()
-
+        # Rolling totals kept by the maintenance run, see lib.trade_volume
+        for window, volumes in trade_volume.get_volumes(loaded_thing.Hash).items():
+            print('{} days ({} recorded): {} sold, {} bought'.format(
+                window, volumes['Days'], volumes['Sold'], volumes['Bought']))
+        print()
 
     else:
         print("Database: {}, Not Found".format(version))
@@ -1,6 +1,6 @@
-import json
-
 import settings
+from lib import codec
+from lib.bounded_pipeline import BoundedPipeline
 from lib.database import Database
 from lib.gwpcc import consts
 from lib.gwpcc.things.thing import Thing
@@ -19,12 +19,11 @@ while not ok:
         ok = True
 
 Database().connect_db(version)
-db = Database().connection
 
-pipe = db.pipeline()
+pipe = BoundedPipeline('Game data import', transaction=True)
 
 with open('{}_thing_data_{}.json'.format(version, language), 'r', encoding='utf-8') as json_file:
-    json_data = json.load(json_file)
+    json_data = codec.load(json_file)
 
     for thing_data in json_data:
 
@@ -44,16 +43,17 @@ with open('{}_thing_data_{}.json'.format(version, language), 'r', encoding='utf-
                 'CurrentSellPrice': thing_data['BaseMarketValue']
             })
 
-        if not translate_only:
-            thing.save_to_database(pipe)
+        with pipe.group():
+            if not translate_only:
+                thing.save_to_database(pipe)
 
-        if not language_added:
-            pipe.sadd(consts.KEY_THING_LOCALE_KNOWN_LANGUAGES, thing_data['LanguageCode'])
-            language_added = True
+            if not language_added:
+                pipe.sadd(consts.KEY_THING_LOCALE_KNOWN_LANGUAGES, thing_data['LanguageCode'])
+                language_added = True
 
-        # Set full name for Thing, Ours is the version of truth, give it a high score.
-        pipe.zadd(consts.KEY_THING_LOCALE_THING_NAMES.format(thing_data['LanguageCode'], thing.Hash),
-                  {thing_data['LocalizedName']: 1000})
+            # Set full name for Thing, Ours is the version of truth, give it a high score.
+            pipe.zadd(consts.KEY_THING_LOCALE_THING_NAMES.format(thing_data['LanguageCode'], thing.Hash),
+                      {thing_data['LocalizedName']: 1000})
 
-count = len(pipe.execute())
-print('Wrote {} items'.format(count))
+pipe.execute()
+print('Wrote {} items in {} flushes'.format(pipe.stats['Commands'], pipe.stats['Flushes']))
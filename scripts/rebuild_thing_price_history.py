@@ -0,0 +1,75 @@
+import csv
+import glob
+import gzip
+import os
+from datetime import date
+
+import settings
+from lib import price_history
+from lib.bounded_pipeline import BoundedPipeline
+from lib.database import Database
+from lib.price_report import report_directory
+
+# Backfills the price history from the daily price reports, then rolls it up again from the oldest report on.
+
+version = None
+while version not in settings.API_DB_CONFIG:
+    version = input('Which version? ')
+
+directory = input('Report directory [{}]: '.format(report_directory())) or report_directory()
+
+Database().connect_db(version)
+
+
+def report_rows(path):
+    """Rows of a report as dicts of strings, Parquet ones need pyarrow."""
+    if path.endswith('.parquet'):
+        import pyarrow.parquet
+        for batch in pyarrow.parquet.ParquetFile(path).iter_batches():
+            for row in batch.to_pylist():
+                yield {column: str(value) for column, value in row.items()}
+        return
+
+    with (gzip.open(path, 'rt', newline='') if path.endswith('.gz') else open(path, 'r', newline='')) as f:
+        yield from csv.DictReader(f)
+
+
+reports = sorted(path for path in glob.glob(os.path.join(directory, '*-{}-market-data.*'.format(version)))
+                 if not path.endswith('.part'))
+
+pipe = BoundedPipeline('Price history backfill', connection=Database().binary_connection)
+thing_hashes = set()
+oldest = None
+
+for path in reports:
+    # Named <YYYY-MM-DD>-<market>-market-data.<format>
+    day = date.fromisoformat(os.path.basename(path)[:10])
+    oldest = day if oldest is None else min(oldest, day)
+
+    rows = 0
+    for row in report_rows(path):
+        # Only version 2 reports have the stock
+        quantity = row.get('quantity')
+
+        with pipe.group():
+            price_history.record_day(pipe,
+                                     row['thing_hash'],
+                                     day,
+                                     float(row['buy_price_new']),
+                                     float(row['sell_price_new']),
+                                     int(quantity) if quantity not in (None, '', 'None') else None,
+                                     int(row['qty_sold']),
+                                     int(row['qty_bought']))
+
+        thing_hashes.add(row['thing_hash'])
+        rows += 1
+
+    print('{} {} rows from {}'.format(day, rows, path))
+
+pipe.execute()
+
+if oldest is not None:
+    price_history.roll_up(thing_hashes, since=oldest)
+
+print('Backfilled {} Things from {} reports, {} commands in {} flushes'.format(
+    len(thing_hashes), len(reports), pipe.stats['Commands'], pipe.stats['Flushes']))
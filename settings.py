@@ -2,8 +2,79 @@ LOG_LEVEL = 'DEBUG'
 DEBUG_FORCE_RUN_NOW = False
 DEBUG_DRY_RUN = False
 
+# Price the whole market in one batched NumPy pass instead of Thing by Thing.
+USE_VECTORIZED_PRICING = True
+
+# Hold the catalogue as compact ThingRecords during maintenance, and how many Things are loaded at a time to make them.
+USE_COMPACT_THINGS = True
+COMPACT_THINGS_CHUNK_SIZE = 5000
+
+# Rebuild the full text indices from scratch instead of only applying what changed since the last run.
+FULL_TEXT_INDEX_FULL_REBUILD = False
+
+# Count letters and write the full text indices with a Lua script inside Redis.
+FULL_TEXT_INDEX_SERVER_SIDE = False
+
+# Read every colony's orders again for the Thing orders index, instead of only the ones added since the last run.
+ORDER_INDEX_FULL_REBUILD = False
+
+# Keep building the per-letter colony index alongside the trigram one, for searches that still read it.
+COLONY_LETTER_INDEX = True
+
+# Most candidates lib.search checks for one query, and how long its matches are cached for paging, in seconds.
+SEARCH_CANDIDATE_LIMIT = 1000
+SEARCH_CACHE_TTL = 300
+
+# Longest the scheduler sleeps before checking the maintenance window again, in seconds.
+SCHEDULER_MAX_SLEEP = 300
+
+# Also wake the scheduler when GlitterBot's config hash changes, needs keyspace notifications enabled on the server.
+SCHEDULER_KEYSPACE_NOTIFICATIONS = False
+
+# Overlap the independent Redis fetches of the integrity check and thing names with asyncio.
+USE_ASYNC_REDIS = False
+
+# Most pipelines the async routines keep in flight at once.
+ASYNC_REDIS_CONCURRENCY = 8
+
+# Most commands and argument bytes a bulk writer queues before sending them, see lib.bounded_pipeline.
+PIPELINE_MAX_COMMANDS = 10000
+PIPELINE_MAX_BYTES = 8 * 1024 * 1024
+
+# JSON codec, auto picks orjson or msgspec when installed and falls back to the standard library json.
+JSON_CODEC = 'auto'
+
+# Where the per-run price change report goes, None for /var/log/glitterbot/ (./ on Windows).
+PRICE_REPORT_DIRECTORY = None
+
+# Price change report format, csv, csv.gz or parquet (needs pyarrow), see lib.price_report.
+PRICE_REPORT_FORMAT = 'csv'
+
+# Price change report columns, 1 for the original ones, 2 adds the Thing's stock as quantity for the price history
+# backfill. A format change for anything reading the columns by position, see lib.price_report.
+PRICE_REPORT_VERSION = 1
+
+# Keep a per-Thing price history, days are kept for PRICE_HISTORY_DAILY_RETENTION days and weeks for
+# PRICE_HISTORY_WEEKLY_RETENTION weeks, months for good. See lib.price_history.
+PRICE_HISTORY_ENABLED = True
+PRICE_HISTORY_DAILY_RETENTION = 400
+PRICE_HISTORY_WEEKLY_RETENTION = 260
+
+# Keep rolling totals of the trade volumes over these windows, in days, and the days' volumes for a few days longer
+# than the longest. See lib.trade_volume.
+TRADE_VOLUME_ENABLED = True
+TRADE_VOLUME_WINDOWS = (1, 7, 30)
+TRADE_VOLUME_SPARE_DAYS = 5
+
+# Window in TRADE_VOLUME_WINDOWS whose mean daily sales the buy price follows, 1 uses today's trades as it always has.
+PRICING_DEMAND_WINDOW = 1
+
 DATABASE_IP = '0.0.0.0'
 DATABASE_PORT = 6379
+
+# Seconds a pooled Redis connection can sit idle before it's checked with a PING.
+DATABASE_HEALTH_CHECK_INTERVAL = 30
+
 DEBUG_MODE = True
 API_DB_CONFIG = {
     'm1': 1,
@@ -0,0 +1,46 @@
+from core.routines.indices import secondary_indices
+
+new_orders = getattr(secondary_indices, '__new_orders')
+
+
+def test_unchanged_list_is_not_read():
+    assert new_orders([3, 'o1', 'o3'], [3, 'o1', 'o3'], False) is None
+
+
+def test_appended_orders_are_read_from_the_tail():
+    assert new_orders([5, 'o1', 'o5'], [3, 'o1', 'o3'], False) == [(-2, -1)]
+
+
+def test_prepended_orders_are_read_from_the_head():
+    assert new_orders([5, 'o5', 'o1'], [3, 'o3', 'o1'], False) == [(0, 1)]
+
+
+def test_trimmed_and_appended_to_the_same_length_is_read_in_full():
+    # Only the high water mark tells the new orders apart, so it is not ALL_ORDERS
+    ranges = new_orders([3, 'o3', 'o5'], [3, 'o1', 'o3'], False)
+
+    assert ranges == [(0, -1)]
+    assert ranges is not secondary_indices.ALL_ORDERS
+
+
+def test_trimmed_and_appended_to_a_longer_list_is_read_in_full():
+    ranges = new_orders([4, 'o3', 'o6'], [3, 'o1', 'o3'], False)
+
+    assert ranges == [(0, -1)]
+    assert ranges is not secondary_indices.ALL_ORDERS
+
+
+def test_shrunk_list_is_indexed_again():
+    assert new_orders([2, 'o2', 'o3'], [3, 'o1', 'o3'], False) is secondary_indices.ALL_ORDERS
+
+
+def test_length_only_cursor_is_indexed_again():
+    assert new_orders([3, 'o1', 'o3'], 3, False) is secondary_indices.ALL_ORDERS
+
+
+def test_new_list_is_indexed_in_full():
+    assert new_orders([3, 'o1', 'o3'], None, False) is secondary_indices.ALL_ORDERS
+
+
+def test_full_rebuild_indexes_everything():
+    assert new_orders([3, 'o1', 'o3'], [3, 'o1', 'o3'], True) is secondary_indices.ALL_ORDERS
@@ -0,0 +1,68 @@
+import copy
+import random
+
+from core.routines import market_values, pricing_engine
+from lib.gwpcc import consts
+from lib.gwpcc.enums import TradeDirection
+from lib.gwpcc.things.thing import Thing
+from lib.price_breaks import PriceBreakIndex
+from lib.runtime_config import RuntimeConfig
+
+PRICE_BREAKS = [
+    {'PriceStart': 0, 'PriceStop': 5, 'StockMin': 1000, 'StockMax': 100000, 'CapBuyPrice': 2.5},
+    {'PriceStart': 5, 'PriceStop': 25, 'StockMin': 200, 'StockMax': 250, 'CapBuyPrice': 2.75},
+    {'PriceStart': 25, 'PriceStop': 50, 'StockMin': 100, 'StockMax': 150, 'CapBuyPrice': 3},
+    {'PriceStart': 50, 'PriceStop': 100, 'StockMin': 10, 'StockMax': 15, 'CapBuyPrice': 3.5},
+    {'PriceStart': 100, 'PriceStop': 100000, 'StockMin': 1, 'StockMax': 15, 'CapBuyPrice': 4},
+    {'PriceStart': 100000, 'PriceStop': 200000, 'StockMin': 1, 'StockMax': 5, 'CapBuyPrice': 4.5}
+]
+
+
+def configure_market():
+    RuntimeConfig()._config_data = {
+        consts.KEY_GLITTERBOT_PRICEBREAKS: PRICE_BREAKS,
+        consts.KEY_GLITTERBOT_MIN_SELL_PRICE_MULTIPLIER: 0.2
+    }
+    RuntimeConfig()._price_break_index = PriceBreakIndex(PRICE_BREAKS)
+
+
+def random_market(count=5000, seed=1):
+    rng = random.Random(seed)
+
+    things = {}
+    for index in range(count):
+        base_market_value = rng.choice([rng.randint(0, 300),
+                                        round(rng.uniform(0, 2000), 2),
+                                        rng.choice([0.3, 5, 25, 50, 100, 100000, 250000])])
+        buy_price = round(base_market_value * rng.uniform(0, 5), rng.choice([None, 0, 1, 2, 5]))
+
+        thing = Thing.from_dict({
+            'Name': 'Thing{}'.format(index),
+            'Quality': '',
+            'StuffType': '',
+            'BaseMarketValue': base_market_value,
+            'MinifiedContainer': False,
+            'UseServerPrice': rng.random() > 0.1,
+            'CurrentBuyPrice': buy_price,
+            'CurrentSellPrice': round(buy_price * rng.uniform(0, 1.5), rng.choice([None, 2]))
+        })
+        thing.Quantity = rng.choice([0, rng.randint(-5, 300), rng.randint(0, 200000)])
+        thing.TradeHistory[TradeDirection.ToPlayer] = rng.choice([0, rng.randint(0, 500)])
+
+        things[thing.Hash] = thing
+
+    return things
+
+
+def price_both_ways(things):
+    """Prices a copy of the market with the per-Thing functions and another copy with the pricing engine."""
+    configure_market()
+
+    per_thing = copy.deepcopy(things)
+    getattr(market_values, '__update_item_buy_prices')(per_thing)
+    getattr(market_values, '__update_item_sell_prices')(per_thing)
+
+    batched = copy.deepcopy(things)
+    pricing_engine.update_item_prices(batched)
+
+    return per_thing, batched
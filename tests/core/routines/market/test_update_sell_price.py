@@ -0,0 +1,11 @@
+from tests.core.routines.market import random_market, price_both_ways
+
+
+def test_pricing_engine_sell_price_parity():
+    per_thing, batched = price_both_ways(random_market())
+
+    for thing_hash, thing in per_thing.items():
+        # Same type as well as the same value, Redis stores 100 and 100.0 differently
+        expected = thing.CurrentSellPrice
+        actual = batched[thing_hash].CurrentSellPrice
+        assert (type(actual), repr(actual)) == (type(expected), repr(expected)), thing
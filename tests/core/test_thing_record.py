@@ -0,0 +1,35 @@
+from core.routines import pricing_engine
+from core.thing_record import ThingRecord
+from tests.core.routines.market import random_market, configure_market
+
+
+def test_thing_record_pricing_parity():
+    configure_market()
+
+    things = random_market()
+    records = {thing_hash: ThingRecord.from_thing(thing) for thing_hash, thing in things.items()}
+
+    pricing_engine.update_item_prices(things)
+    pricing_engine.update_item_prices(records)
+
+    for thing_hash, thing in things.items():
+        record = records[thing_hash]
+        assert record.CurrentBuyPrice == thing.CurrentBuyPrice, thing
+        assert record.CurrentSellPrice == thing.CurrentSellPrice, thing
+        assert record.has_changed('CurrentBuyPrice') == thing.has_changed('CurrentBuyPrice'), thing
+        assert record.has_changed('CurrentSellPrice') == thing.has_changed('CurrentSellPrice'), thing
+
+
+def test_thing_record_change_detection():
+    record = ThingRecord.from_thing(next(iter(random_market(count=1).values())))
+    original = record.Quantity
+
+    assert not record.changed_fields()
+
+    record.Quantity = original + 10
+    assert record.has_changed('Quantity')
+    assert record.get_change('Quantity') == original
+    assert record.changed_fields() == {'Quantity': original + 10}
+
+    record.Quantity = original
+    assert not record.has_changed('Quantity')
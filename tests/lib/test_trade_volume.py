@@ -0,0 +1,79 @@
+import settings
+from lib import trade_volume
+
+WINDOWS = (1, 7, 30)
+
+
+class Market(object):
+    """The day hashes and window totals trade_volume keeps in Redis, with the day hashes expiring as they would."""
+
+    def __init__(self):
+        self.days = {}
+        self.totals = {window: {} for window in WINDOWS}
+        self.last = None
+
+    def run(self, today, sold):
+        # Expired after the longest window plus the spare days
+        ttl = max(WINDOWS) + settings.TRADE_VOLUME_SPARE_DAYS
+        self.days = {day: volumes for day, volumes in self.days.items() if day + ttl > today}
+
+        volumes = {trade_volume.DAYS: 1, 'thing:Sold': sold}
+
+        replace, window_values = trade_volume.plan(WINDOWS, self.last, today, volumes, self.read_days)
+        self.days[today] = volumes
+
+        for window, values in window_values.items():
+            if replace:
+                self.totals[window] = dict(values)
+            else:
+                for field, change in values.items():
+                    self.totals[window][field] = self.totals[window].get(field, 0) + change
+
+        self.last = today
+
+    def read_days(self, days):
+        return {day: self.days.get(day, {}) for day in days}
+
+    def expected(self, today, window):
+        days = [self.days[day] for day in range(today - window + 1, today + 1) if day in self.days]
+        return {trade_volume.DAYS: len(days), 'thing:Sold': sum(volumes['thing:Sold'] for volumes in days)}
+
+
+def check(market, today):
+    for window in WINDOWS:
+        totals = market.totals[window]
+        actual = {field: totals.get(field, 0) for field in (trade_volume.DAYS, 'thing:Sold')}
+        assert actual == market.expected(today, window), (today, window)
+
+
+def test_trade_volume_daily_runs():
+    market = Market()
+
+    for today in range(1000, 1100):
+        market.run(today, today % 7)
+        check(market, today)
+
+
+def test_trade_volume_same_day_runs():
+    market = Market()
+
+    for today in range(1000, 1040):
+        market.run(today, 5)
+        market.run(today, 8)
+        check(market, today)
+
+
+def test_trade_volume_gaps():
+    # Every gap from a day up to past the longest window, the days leaving the windows have expired in some of them
+    for gap in range(1, 40):
+        market = Market()
+
+        for today in range(1000, 1040):
+            market.run(today, 10)
+        market.run(1039 + gap, 10)
+        check(market, 1039 + gap)
+
+        # And it carries on from there
+        for today in range(1040 + gap, 1080 + gap):
+            market.run(today, 10)
+            check(market, today)
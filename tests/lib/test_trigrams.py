@@ -0,0 +1,52 @@
+from lib import trigrams
+
+
+def matches(query, text):
+    return trigrams.query_trigrams(query) <= set(trigrams.trigrams(text))
+
+
+def test_words_are_padded_for_prefixes():
+    assert trigrams.trigrams('Fire Base') == ['  f', ' fi', 'fir', 'ire', 're ', '  b', ' ba', 'bas', 'ase', 'se ']
+
+
+def test_word_matches_anywhere_in_a_word():
+    assert matches('fire', 'Fire Base')
+    assert matches('ire', 'Fire Base')
+    assert matches('base', 'Firebase')
+
+
+def test_separator_pins_the_word_to_a_word_start():
+    assert matches(' base', 'Fire Base')
+    assert not matches(' base', 'Firebase')
+
+
+def test_separator_pins_the_word_to_a_word_end():
+    assert matches('fire ', 'Fire Base')
+    assert not matches('fire ', 'Firebase')
+
+
+def test_words_after_the_first_start_a_word():
+    assert matches('re ba', 'Fire Base')
+    assert not matches('re ba', 'Firebase')
+
+
+def test_short_query_only_matches_word_starts():
+    assert trigrams.prefix_only('ir')
+    assert matches('ir', 'Iron')
+    assert not matches('ir', 'Fire')
+
+
+def test_short_query_with_separator_is_not_prefix_only():
+    assert not trigrams.prefix_only(' ir')
+    assert matches(' ir', 'Iron')
+    assert not matches(' ir', 'Fire')
+
+
+def test_three_letters_match_inside_a_word():
+    assert not trigrams.prefix_only('fir')
+    assert matches('ire', 'Fire')
+
+
+def test_query_without_words_matches_nothing():
+    assert trigrams.query_trigrams(' - ') == set()
+    assert not trigrams.prefix_only(' - ')